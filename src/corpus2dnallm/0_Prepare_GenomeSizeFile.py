@@ -1,12 +1,68 @@
 import os
+import bisect
 import pandas as pd
-from Bio import SeqIO
 import argparse
-import pyfastx
 from glob import glob
-import re
 import fnmatch
-import gzip
+import multiprocessing as mp
+
+# 优先使用python-isal（ISA-L加速的gzip解压），未安装时退回标准库gzip
+try:
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+# xopen为可选依赖，可调用外部pigz并行解压
+try:
+    from xopen import xopen
+except ImportError:
+    xopen = None
+
+# 基因组文件扩展名，较长的后缀优先匹配（.fa.gz先于.fa）
+GENOME_EXTENSIONS = ('.fasta.gz', '.fa.gz', '.fasta', '.fa')
+
+
+def index_genome_dir(genome_dir):
+    """
+    列出一次目录，建立 小写基因组名 -> 文件路径 的映射。
+
+    Args:
+        genome_dir (str): 基因组文件所在的目录。
+
+    Returns:
+        tuple: (去掉扩展名后的小写文件名到完整路径的映射, 排序后的小写文件名列表)
+    """
+    path_index = {}
+    for file in sorted(os.listdir(genome_dir)):
+        if file.startswith('.'):
+            continue
+        lower = file.lower()
+        for ext in GENOME_EXTENSIONS:
+            if lower.endswith(ext):
+                path_index.setdefault(lower[:-len(ext)], os.path.join(genome_dir, file))
+                break
+    # 文件名只排序一次，供前缀匹配时二分查找
+    return path_index, sorted(path_index)
+
+
+def lookup_genome_file(genome_index, genome_name):
+    """
+    按基因组名查找文件路径，找不到同名文件时退回原来的前缀匹配（genome_name*）。
+
+    Args:
+        genome_index (tuple): index_genome_dir的返回值。
+        genome_name (str): 基因组名称。
+    """
+    path_index, stems = genome_index
+    genome_name = genome_name.lower()
+    if genome_name in path_index:
+        return path_index[genome_name]
+    # 以前缀开头的文件名在排序后的列表中是连续的，二分查找第一个不小于前缀的位置即可
+    i = bisect.bisect_left(stems, genome_name)
+    if i < len(stems) and stems[i].startswith(genome_name):
+        return path_index[stems[i]]
+    return None
+
 
 def check_genome_files(genomes_info_path, masked_dir, unmasked_dir):
     """
@@ -25,7 +81,11 @@ def check_genome_files(genomes_info_path, masked_dir, unmasked_dir):
     # 读取基因组信息文件
     genome_df = pd.read_csv(genomes_info_path, sep='\t', index_col=0)
     
-    genome_df.index = genome_df.index.to_series().str.lower()
+    genome_df.index = genome_df.index.str.lower()
+
+    # 每个目录只列出一次，文件名统一转换为小写
+    masked_files = [file.lower() for file in os.listdir(masked_dir)]
+    unmasked_files = [file.lower() for file in os.listdir(unmasked_dir)]
 
     for genome_name in genome_df.index:
 
@@ -37,16 +97,16 @@ def check_genome_files(genomes_info_path, masked_dir, unmasked_dir):
 
         if genome_type == 'both':
             # 检查hardmasked基因组文件是否存在
-            if not any(fnmatch.fnmatch(file.lower(), pattern) for pattern in file_patterns for file in os.listdir(masked_dir)):
+            if not any(fnmatch.filter(masked_files, pattern) for pattern in file_patterns):
                 print(f"{genome_name} hardmasked not existed")
                 FLAG = False
             # 检查unmasked基因组文件是否存在
-            if not any(fnmatch.fnmatch(file.lower(), pattern) for pattern in file_patterns for file in os.listdir(unmasked_dir)):
+            if not any(fnmatch.filter(unmasked_files, pattern) for pattern in file_patterns):
                 print(f"{genome_name} unmasked not existed")
                 FLAG = False
         else:
             # 检查unmasked基因组文件是否存在
-            if not any(fnmatch.fnmatch(file.lower(), pattern) for pattern in file_patterns for file in os.listdir(unmasked_dir)):
+            if not any(fnmatch.filter(unmasked_files, pattern) for pattern in file_patterns):
                 print(f"{genome_name} unmasked not existed")
                 FLAG = False
 
@@ -54,6 +114,22 @@ def check_genome_files(genomes_info_path, masked_dir, unmasked_dir):
 
     
 
+def open_gzip(fasta_file, threads=1):
+    """
+    以二进制方式打开gzip压缩的FASTA文件。
+
+    安装了xopen时通过外部pigz/isal进程解压，否则使用gzip模块。
+    调用方本身运行在占满所有CPU核的进程池中，默认每个文件只用1个解压线程，避免超额占用CPU。
+
+    Args:
+        fasta_file (str): gzip压缩的FASTA文件路径。
+        threads (int): xopen使用的解压线程数，0表示在当前进程内解压。
+    """
+    if xopen is not None:
+        return xopen(fasta_file, 'rb', threads=threads)
+    return gzip.open(fasta_file, 'rb')
+
+
 def fasta_stats(fasta_file):
     """
     计算FASTA文件的统计信息。
@@ -68,27 +144,61 @@ def fasta_stats(fasta_file):
     num_sequences = 0  # 序列总数
     min_length = float('inf')  # 最小序列长度，初始化为正无穷大
     max_length = 0  # 最大序列长度，初始化为0
-    lengths = []  # 存储所有序列长度的列表
 
-    # 使用Biopython的SeqIO模块解析FASTA文件
-    if fasta_file.endswith('.gz') or fasta_file.endswith('.gzip'):
-        with gzip.open(fasta_file, "rt") as handle:
-            for record in SeqIO.parse(handle, 'fasta'):
-                seq_length = len(record.seq)  # 当前序列的长度
-                total_bases += seq_length  # 累加总碱基数
-                num_sequences += 1  # 累加序列总数
-                min_length = min(min_length, seq_length)  # 更新最小序列长度
-                max_length = max(max_length, seq_length)  # 更新最大序列长度
-                lengths.append(seq_length)  # 将当前序列长度添加到列表中
+    current_seq_len = 0  # 当前序列已累计的碱基数，跨数据块保持
+    in_record = False  # 是否已经进入第一条记录（跳过首个'>'之前的内容）
+    in_header = False  # 当前是否位于标题行中（标题行可能跨越数据块）
 
+    # 以二进制方式按1 MiB数据块读取，只统计长度，不构造序列字符串
+    if fasta_file.endswith('.gz') or fasta_file.endswith('.gzip'):
+        handle = open_gzip(fasta_file)
     else:
-        for record in SeqIO.parse(fasta_file, 'fasta'):
-            seq_length = len(record.seq)  # 当前序列的长度
-            total_bases += seq_length  # 累加总碱基数
-            num_sequences += 1  # 累加序列总数
-            min_length = min(min_length, seq_length)  # 更新最小序列长度
-            max_length = max(max_length, seq_length)  # 更新最大序列长度
-            lengths.append(seq_length)  # 将当前序列长度添加到列表中
+        handle = open(fasta_file, 'rb', buffering=0)
+
+    with handle:
+        while True:
+            block = handle.read(1 << 20)
+            if not block:
+                break
+
+            pos = 0
+            block_len = len(block)
+            while pos < block_len:
+                if in_header:
+                    # 跳过标题行剩余部分
+                    nl = block.find(b'\n', pos)
+                    if nl == -1:
+                        break
+                    in_header = False
+                    pos = nl + 1
+                    continue
+
+                # 查找下一条记录的开始位置，之前的部分都属于当前记录的序列行
+                gt = block.find(b'>', pos)
+                end = block_len if gt == -1 else gt
+                if in_record:
+                    current_seq_len += (end - pos) - block.count(b'\n', pos, end) - block.count(b'\r', pos, end)
+
+                if gt == -1:
+                    break
+
+                # 遇到新记录，结算上一条记录的长度
+                if in_record:
+                    total_bases += current_seq_len  # 累加总碱基数
+                    num_sequences += 1  # 累加序列总数
+                    min_length = min(min_length, current_seq_len)  # 更新最小序列长度
+                    max_length = max(max_length, current_seq_len)  # 更新最大序列长度
+                in_record = True
+                in_header = True
+                current_seq_len = 0
+                pos = gt + 1
+
+    # 结算最后一条记录
+    if in_record:
+        total_bases += current_seq_len
+        num_sequences += 1
+        min_length = min(min_length, current_seq_len)
+        max_length = max(max_length, current_seq_len)
 
     average_length = int(round(total_bases / num_sequences, 0))  # 计算平均序列长度，并四舍五入到整数
 
@@ -101,7 +211,7 @@ def fasta_stats(fasta_file):
     }
 
 
-def write_genome_sizes(genomes_info_path, unmasked_dir, output_dir):
+def write_genome_sizes(genomes_info_path, unmasked_dir, output_dir, threads=None):
     """
     计算并写入基因组大小的统计信息。
 
@@ -109,42 +219,102 @@ def write_genome_sizes(genomes_info_path, unmasked_dir, output_dir):
         genomes_info_path (str): 包含基因组信息的Excel文件路径。
         unmasked_dir (str): unmasked基因组文件所在的目录。
         output_dir (str): 输出文件的路径。
+        threads (int): 并行统计使用的进程数，默认为CPU核数。
     """
 
     output_file = os.path.join(output_dir, 'genome_sizes.txt')
 
-    # 打开输出文件并准备写入表头
+    # 读取包含基因组信息的Excel文件
+    genome_df = pd.read_csv(genomes_info_path, sep='\t', index_col=0)
+
+    genome_df.index = genome_df.index.str.lower()
+
+    # 只列出一次unmasked目录，按基因组名直接查找文件路径
+    genome_index = index_genome_dir(unmasked_dir)
+
+    tasks = []
+    for genome_name in genome_df.index:
+        fasta_file = lookup_genome_file(genome_index, genome_name)
+        if fasta_file is not None:
+            tasks.append((genome_name, fasta_file))
+
+    # 各基因组互不相关，使用进程池并行计算统计信息
+    threads = threads or mp.cpu_count()
+    with mp.Pool(max(1, min(threads, len(tasks)))) as pool:
+        results = pool.map(fasta_stats, [fasta_file for _, fasta_file in tasks])
+
+    # 打开输出文件，按输入顺序写入表头和统计信息
     with open(output_file, 'w') as outfile:
         print('file', 'format', 'type', 'num_seqs', 'sum_len', 'min_len', 'avg_len', 'max_len', sep='\t', file=outfile)
 
-        # 读取包含基因组信息的Excel文件
-        genome_df = pd.read_csv(genomes_info_path, sep='\t', index_col=0)
-        
-        genome_df.index = genome_df.index.to_series().str.lower()
-
-        file_patterns = ["fa", 'fasta', 'fa.gz', 'fasta.gz'] 
-
-        # 遍历所有基因组名称
-        for genome_name in genome_df.index:
-
-            # 遍历所有可能的文件后缀模式
-            for pattern in file_patterns:
-                # 构建文件路径
-                path = os.path.join(unmasked_dir, f"{genome_name}*{pattern}")
-                
-                # 检查是否存在符合条件的文件
-                if len(glob(path)) > 0:
-                    # 获取符合条件的第一个文件路径
-                    fasta_file = glob(path)[0]
-                    break
-
-            # 计算该FASTA文件的统计信息
-            result = fasta_stats(fasta_file)
-            # 将统计信息写入输出文件
+        for (genome_name, _), result in zip(tasks, results):
             print(genome_name, 'FASTA', 'DNA', result['num_seqs'], result['sum_len'], result['min_len'], result['avg_len'], result['max_len'], sep='\t', file=outfile)
 
 
 
+# 小写字母到大写字母的转换表，与删除换行符在同一次translate中完成
+UPPER_TABLE = bytes.maketrans(b'abcdefghijklmnopqrstuvwxyz', b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+
+def read_fasta(fasta_file, chunk_size=1 << 18):
+    """
+    流式读取FASTA文件，逐条返回(序列名, 序列)。
+
+    以256 KiB数据块顺序读取（支持gzip压缩文件），在行首的'>'处切分记录，
+    不建立索引文件。序列为去除换行并转换为大写的bytes。
+
+    Args:
+        fasta_file (str): FASTA文件的路径。
+        chunk_size (int): 每次读取的数据块大小。
+
+    Yields:
+        tuple: (name, seq)，name为str，seq为bytes。
+    """
+    if fasta_file.endswith('.gz') or fasta_file.endswith('.gzip'):
+        handle = open_gzip(fasta_file)
+    else:
+        handle = open(fasta_file, 'rb')
+
+    def parse_record(record):
+        # 跳过第一条记录之前的非FASTA内容
+        gt = record.find(b'>')
+        if gt == -1:
+            return None
+        nl = record.find(b'\n', gt)
+        if nl == -1:
+            nl = len(record)
+        header = record[gt + 1:nl].split(None, 1)
+        name = header[0].decode() if header else ''
+        return name, record[nl + 1:].translate(UPPER_TABLE, b'\r\n')
+
+    with handle:
+        buf = bytearray()
+        scan = 0  # 已搜索过的位置，避免长序列被重复扫描
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                break
+            buf += chunk
+
+            start = 0
+            idx = buf.find(b'\n>', scan)
+            while idx != -1:
+                result = parse_record(bytes(buf[start:idx]))
+                if result is not None:
+                    yield result
+                start = idx + 1
+                idx = buf.find(b'\n>', start)
+
+            if start:
+                del buf[:start]
+            scan = max(len(buf) - 1, 0)
+
+        if buf:
+            result = parse_record(bytes(buf))
+            if result is not None:
+                yield result
+
+
 def split_hardmask_genome(masked_dir, out_dir):
     # 列出所有.fa文件
 
@@ -155,25 +325,17 @@ def split_hardmask_genome(masked_dir, out_dir):
     os.makedirs(out_dir, exist_ok=True)
 
     for filename in filenames:
-        # 创建pyfastx Fasta对象
-        fa = pyfastx.Fasta(filename, build_index=True, uppercase=True)
-
         # 生成输出文件名
         outfilename = os.path.join(out_dir, os.path.basename(filename)).replace('.fa', '_sp.txt').replace('.fasta', '_sp.txt').replace('.fa.gz', '_sp.txt').replace('.fasta.gz', '_sp.txt')
 
-        # 打开输出文件
-        with open(outfilename, 'w') as outio:
-            for seq in fa:
-                sequence = seq.seq
-                seqlist = re.split(r'[N]+', sequence)
-                sub = 0
+        # 打开输出文件，顺序流式读取序列
+        with open(outfilename, 'wb') as outio:
+            for name, sequence in read_fasta(filename):
+                # 单字符分隔直接使用bytes.split，连续N产生的空片段被过滤
+                seqlist = [p for p in sequence.split(b'N') if p]
 
                 for seq_in_list in seqlist:
-                    n = len(seq_in_list)
-
-                    sub += 1
-                    if seq_in_list:
-                        print(seq_in_list, file=outio)
+                    outio.write(seq_in_list + b'\n')
 
 
 
@@ -190,6 +352,8 @@ def main():
                         help='Directory where unmasked genome files are located')
     parser.add_argument('--output_dir', type=str, required=True,
                         help='Path to the output file where genome sizes will be written')
+    parser.add_argument('--threads', type=int, default=mp.cpu_count(),
+                        help='Number of processes used to compute genome sizes in parallel')
 
     # 解析命令行参数
     args = parser.parse_args()
@@ -198,7 +362,7 @@ def main():
     
     if check_genome_files(args.genomes_info_path, args.masked_dir, args.unmasked_dir):
     
-        write_genome_sizes(args.genomes_info_path, args.unmasked_dir, args.output_dir)
+        write_genome_sizes(args.genomes_info_path, args.unmasked_dir, args.output_dir, args.threads)
 
         split_hardmask_genome(args.masked_dir, args.output_dir)
 
@@ -1,14 +1,32 @@
 import os
+import bisect
 import glob
 import argparse
 from random import randint
-import pyfastx
+import gzip
+import multiprocessing as mp
+import shutil
+import mmap
+import tempfile
 from glob import glob
 import fnmatch
+import functools
 import re
 import numpy as np
 import pandas as pd
 
+# numba为可选依赖，安装后使用JIT编译的拆分循环
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# xopen为可选依赖，可调用外部pigz并行解压
+try:
+    from xopen import xopen
+except ImportError:
+    xopen = None
+
 """
 功能:
 拆分大基因组，从Unmasked或HardMasked基因组文件中提取序列，拆分成长度为N的子序列，并将子序列写入到输出文件中。
@@ -21,6 +39,7 @@ import pandas as pd
 --outfile: 输出文件路径
 --length: 拆分序列的最长长度，默认为4000
 --GenomeSplit: 拆分Unmasked基因组的最大长度，默认为500
+--threads: 并行处理基因组的进程数，默认为CPU核数
 
 输出:
 将拆分后的子序列写入到输出文件中。
@@ -53,6 +72,10 @@ def parseArgs():
     parser.add_argument('--GenomeSplit', dest='GenomeSplit', help='Max length for split genome according to genome size (MB)',
                         type=int, default=500)
 
+    # 指定并行处理基因组的进程数
+    parser.add_argument('--threads', dest='threads', help='Number of processes used to generate genome corpus in parallel',
+                        type=int, default=mp.cpu_count())
+
     # 解析命令行参数并返回结果
     args = parser.parse_args()
 
@@ -60,31 +83,273 @@ def parseArgs():
 
 
 
+@functools.lru_cache(maxsize=None)
+def listdir_cached(where):
+    '''Returns the directory listing of `where`, read once per process.'''
+    return tuple(os.listdir(where))
+
+
 def findfiles(which, where='.'):
     '''Returns list of filenames from `where` path matched by 'which'
     shell pattern. Matching is case-insensitive.'''
 
     # TODO: recursive param with walk() filtering
     rule = re.compile(fnmatch.translate(which), re.IGNORECASE)
-    return [name for name in os.listdir(where) if rule.match(name)]
+    return [name for name in listdir_cached(where) if rule.match(name)]
+
+
+# 基因组文件扩展名，较长的后缀优先匹配（.fa.gz先于.fa）
+GENOME_EXTENSIONS = ('.fasta.gz', '.fa.gz', '.fasta', '.fa')
+
+
+def index_genome_dir(genome_dir):
+    """
+    列出一次目录，建立 小写基因组名 -> 文件路径 的映射。
+
+    Args:
+        genome_dir (str): 基因组文件所在的目录。
+
+    Returns:
+        tuple: (去掉扩展名后的小写文件名到完整路径的映射, 排序后的小写文件名列表)
+    """
+    path_index = {}
+    for file in sorted(os.listdir(genome_dir)):
+        if file.startswith('.'):
+            continue
+        lower = file.lower()
+        for ext in GENOME_EXTENSIONS:
+            if lower.endswith(ext):
+                path_index.setdefault(lower[:-len(ext)], os.path.join(genome_dir, file))
+                break
+    # 文件名只排序一次，供前缀匹配时二分查找
+    return path_index, sorted(path_index)
+
+
+def lookup_genome_file(genome_index, genome_name):
+    """
+    按基因组名查找文件路径，找不到同名文件时退回原来的前缀匹配（genome_name*）。
+
+    Args:
+        genome_index (tuple): index_genome_dir的返回值。
+        genome_name (str): 基因组名称。
+    """
+    path_index, stems = genome_index
+    genome_name = genome_name.lower()
+    if genome_name in path_index:
+        return path_index[genome_name]
+    # 以前缀开头的文件名在排序后的列表中是连续的，二分查找第一个不小于前缀的位置即可
+    i = bisect.bisect_left(stems, genome_name)
+    if i < len(stems) and stems[i].startswith(genome_name):
+        return path_index[stems[i]]
+    return None
+
+
+def open_gzip(fasta_file, threads=1):
+    """
+    以二进制方式打开gzip压缩的FASTA文件。
+
+    安装了xopen时通过外部pigz/isal进程解压，否则使用gzip模块。
+    调用方本身运行在占满所有CPU核的进程池中，默认每个文件只用1个解压线程，避免超额占用CPU。
+
+    Args:
+        fasta_file (str): gzip压缩的FASTA文件路径。
+        threads (int): xopen使用的解压线程数，0表示在当前进程内解压。
+    """
+    if xopen is not None:
+        return xopen(fasta_file, 'rb', threads=threads)
+    return gzip.open(fasta_file, 'rb')
+
+
+# 小写字母到大写字母的转换表，与删除换行符在同一次translate中完成
+UPPER_TABLE = bytes.maketrans(b'abcdefghijklmnopqrstuvwxyz', b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+
+def read_fasta(fasta_file, chunk_size=1 << 18):
+    """
+    流式读取FASTA文件，逐条返回(序列名, 序列)。
+
+    以256 KiB数据块顺序读取（支持gzip压缩文件），在行首的'>'处切分记录，
+    不建立索引文件。序列为去除换行并转换为大写的bytes。
+
+    Args:
+        fasta_file (str): FASTA文件的路径。
+        chunk_size (int): 每次读取的数据块大小。
+
+    Yields:
+        tuple: (name, seq)，name为str，seq为bytes。
+    """
+    if fasta_file.endswith('.gz') or fasta_file.endswith('.gzip'):
+        handle = open_gzip(fasta_file)
+    else:
+        handle = open(fasta_file, 'rb')
+
+    def parse_record(record):
+        # 跳过第一条记录之前的非FASTA内容
+        gt = record.find(b'>')
+        if gt == -1:
+            return None
+        nl = record.find(b'\n', gt)
+        if nl == -1:
+            nl = len(record)
+        header = record[gt + 1:nl].split(None, 1)
+        name = header[0].decode() if header else ''
+        return name, record[nl + 1:].translate(UPPER_TABLE, b'\r\n')
+
+    with handle:
+        buf = bytearray()
+        scan = 0  # 已搜索过的位置，避免长序列被重复扫描
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                break
+            buf += chunk
+
+            start = 0
+            idx = buf.find(b'\n>', scan)
+            while idx != -1:
+                result = parse_record(bytes(buf[start:idx]))
+                if result is not None:
+                    yield result
+                start = idx + 1
+                idx = buf.find(b'\n>', start)
+
+            if start:
+                del buf[:start]
+            scan = max(len(buf) - 1, 0)
+
+        if buf:
+            result = parse_record(bytes(buf))
+            if result is not None:
+                yield result
+
+
+def read_lines_mmap(path):
+    """
+    以内存映射方式读取文本文件，逐行返回去除行尾换行符的bytes。
+
+    换行符的查找在mmap上以C速度完成，不经过Python的缓冲读取器。
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        size = len(mm)
+        while start < size:
+            end = mm.find(b'\n', start)
+            if end == -1:
+                end = size
+            yield mm[start:end].rstrip()
+            start = end + 1
+
+
+# 合法碱基，用于bytes.translate删除后判断是否存在非法字符
+VALID_BASES = b'ACGTN'
+
+
+def split_offsets(seq_u8, min_length, max_length, seed):
+    """
+    按split_sequence的规则随机切分uint8序列，返回通过过滤的窗口起点和长度。
+
+    只在安装了numba时使用（JIT编译），逐字节统计N并检查非法字符，
+    只有被接受的窗口才会在Python中切出bytes。
+    """
+    np.random.seed(seed)
+    n = seq_u8.shape[0]
+    capacity = n // max_length + 16
+    starts = np.empty(capacity, dtype=np.int64)
+    lens = np.empty(capacity, dtype=np.int64)
+    k = 0
+    s = 0
+    while s < n:
+        # 一半概率取max_length，否则取min_length到max_length之间的随机长度
+        if np.random.randint(0, 2) == 0:
+            sublen = max_length
+        else:
+            sublen = np.random.randint(min_length, max_length + 1)
+        end = min(s + sublen, n)
+        length = end - s
+        if length >= min_length:
+            N_count = 0
+            valid = True
+            for i in range(s, end):
+                c = seq_u8[i]
+                if c == 78:  # N
+                    N_count += 1
+                elif c != 65 and c != 67 and c != 71 and c != 84:  # A C G T
+                    valid = False
+                    break
+            if valid and N_count / length <= 0.2:
+                if k == capacity:
+                    # 空间不足时按两倍扩容
+                    capacity *= 2
+                    new_starts = np.empty(capacity, dtype=np.int64)
+                    new_lens = np.empty(capacity, dtype=np.int64)
+                    new_starts[:k] = starts[:k]
+                    new_lens[:k] = lens[:k]
+                    starts = new_starts
+                    lens = new_lens
+                starts[k] = s
+                lens[k] = length
+                k += 1
+        s += sublen
+    return starts[:k], lens[:k]
+
+
+def split_at_N_runs(seq_u8, min_N_run):
+    """
+    单次遍历uint8序列，在连续min_N_run个及以上的N处拆分，返回非空片段的起点和终点。
+
+    结果与按正则N{10,}拆分相同（去掉空片段），只在安装了numba时使用。
+    """
+    n = seq_u8.shape[0]
+    capacity = 64
+    starts = np.empty(capacity, dtype=np.int64)
+    ends = np.empty(capacity, dtype=np.int64)
+    k = 0
+    seg_start = 0
+    run_len = 0
+    for i in range(n + 1):
+        # 序列末尾视为一个非N字符，用于结算最后一个片段
+        if i < n and seq_u8[i] == 78:  # N
+            run_len += 1
+            continue
+        if i == n or run_len >= min_N_run:
+            seg_end = i - run_len if run_len >= min_N_run else i
+            if seg_end > seg_start:
+                if k == capacity:
+                    # 空间不足时按两倍扩容
+                    capacity *= 2
+                    new_starts = np.empty(capacity, dtype=np.int64)
+                    new_ends = np.empty(capacity, dtype=np.int64)
+                    new_starts[:k] = starts[:k]
+                    new_ends[:k] = ends[:k]
+                    starts = new_starts
+                    ends = new_ends
+                starts[k] = seg_start
+                ends[k] = seg_end
+                k += 1
+            seg_start = i
+        run_len = 0
+    return starts[:k], ends[:k]
+
+
+if njit is not None:
+    split_offsets = njit(cache=True)(split_offsets)
+    split_at_N_runs = njit(cache=True)(split_at_N_runs)
 
 
 class GenomeObj():
 
-    def __init__(self, genomes_info_path, genome_name, UnMaskDir, SplitMaskDir, GenomeSizeFile):
+    def __init__(self, genome_info_df, genome_size_df, genome_name, UnMaskDir, SplitMaskDir, UnMaskIndex=None):
         # 设置基因组名称
         self.genome_name = genome_name
 
-        file_patterns = ["fa", 'fasta', 'fa.gz', 'fasta.gz']
-
-        # 遍历所有基因组名称的扩展名，找到对应的基因组文件
-        for pattern in file_patterns:
-            UnMaskPath = findfiles(f"{genome_name}*{pattern}", UnMaskDir)
-            if len(UnMaskPath) > 0:
-                # 获取第一个找到的基因组文件路径
-                self.UnMask_genome_file_path = os.path.join(UnMaskDir, UnMaskPath[0])
-                # 跳出循环
-                break
+        # 由目录索引直接查找对应的基因组文件，未传入索引时现场建立
+        if UnMaskIndex is None:
+            UnMaskIndex = index_genome_dir(UnMaskDir)
+        UnMaskPath = lookup_genome_file(UnMaskIndex, genome_name)
+        if UnMaskPath is not None:
+            self.UnMask_genome_file_path = UnMaskPath
             # # 拼接未屏蔽基因组的路径
             # UnMaskPath = os.path.join(UnMaskDir, f"{genome_name}*{pattern}")
             # # 如果找到了对应的基因组文件
@@ -94,14 +359,11 @@ class GenomeObj():
             #     # 跳出循环
             #     break
 
-        # 从文件中读取UnMask基因组的大小
+        # 从已读取的基因组大小表中获取UnMask基因组的大小
         self.UnMask_genome_size = round(
-            int(pd.read_csv(GenomeSizeFile, sep='\t', index_col=0).loc[genome_name, 'sum_len']) / 1000000, 2)
+            int(genome_size_df.loc[genome_name, 'sum_len']) / 1000000, 2)
 
-        genome_df = pd.read_csv(genomes_info_path, sep='\t', index_col=0)
-        genome_df.index = genome_df.index.to_series().str.lower()
-
-        genome_type = genome_df.loc[genome_name, 'genome_type']
+        genome_type = genome_info_df.loc[genome_name, 'genome_type']
 
         if genome_type == 'both':
             # 拼接分割屏蔽基因组的路径
@@ -113,15 +375,18 @@ class GenomeObj():
             # # 获取分割屏蔽基因组文件的路径
             # self.SplitMask_genome_file_path = glob(SplitMaskPath)[0]
 
-            # 打开SplitMask基因组文件
-            with open(self.SplitMask_genome_file_path, 'r') as file:
-                content = file.read()
-                # 移除空格和换行符
-                cleaned_content = content.replace('\n', '')
-
-            # 计算分割屏蔽基因组的大小，并转换为MB单位
-            # 计算分割屏蔽基因组的大小
-            self.SplitMask_genome_size =  round(len(cleaned_content)/ 1000000, 2)
+            # 分块统计SplitMask基因组文件中的换行符个数，无需读入整个文件
+            file_size = os.path.getsize(self.SplitMask_genome_file_path)
+            newline_count = 0
+            with open(self.SplitMask_genome_file_path, 'rb') as file:
+                while True:
+                    chunk = file.read(1 << 20)
+                    if not chunk:
+                        break
+                    newline_count += chunk.count(b'\n')
+
+            # 计算分割屏蔽基因组的大小（不含换行符），并转换为MB单位
+            self.SplitMask_genome_size =  round((file_size - newline_count) / 1000000, 2)
         else:
             SplitMaskPath = 'none'
             self.SplitMask_genome_size =  'none'
@@ -133,11 +398,11 @@ class GenomeObj():
         # if hardmask > 250M, hardmask use 250M, unmask use 250M
         # if hardmask < 250M, hardmask use all, unmask use 250M
 
-        total_seq_list = []
+        # 以生成器方式逐条产生子序列，不在内存中累积整个基因组的语料
 
         if self.UnMask_genome_size <= split_size:
 
-            total_seq_list = self.get_all_UnMask(max_length)
+            yield from self.get_all_UnMask(max_length)
 
         else:
             
@@ -145,198 +410,227 @@ class GenomeObj():
 
             if self.SplitMask_genome_size >= split_size / 2:
 
-                total_seq_list = self.get_SplitHardMask(total_len=max_genome_size, max_length=max_length) + \
-                                 self.get_SplitUnMask(total_len=max_genome_size, max_length=max_length)
+                yield from self.get_SplitHardMask(total_len=max_genome_size, max_length=max_length)
+                yield from self.get_SplitUnMask(total_len=max_genome_size, max_length=max_length)
 
             else:
 
-                total_seq_list = self.get_all_HardMask(max_length=max_length) + \
-                                 self.get_SplitUnMask(total_len=max_genome_size, max_length=max_length)
-
-        return total_seq_list
+                yield from self.get_all_HardMask(max_length=max_length)
+                yield from self.get_SplitUnMask(total_len=max_genome_size, max_length=max_length)
 
 
     def split_sequence(self, sequence, min_length=5, max_length=4000):
-        seqlist = []  # 初始化一个空列表来存储子序列
+        if njit is not None:
+            # 使用JIT编译的循环计算窗口位置，再切出被接受的子序列
+            starts, lens = split_offsets(np.frombuffer(sequence, dtype=np.uint8), min_length, max_length,
+                                         randint(0, 2**31 - 1))
+            for s, l in zip(starts.tolist(), lens.tolist()):
+                yield sequence[s:s + l]
+            return
+
         n = len(sequence)  # 获取序列的长度
         s = 0  # 初始化一个变量s，用于追踪当前的位置
         #print(f'{self.UnMask_genome_file_path}\t{seq.name}\t{n}')  # 打印fasta文件名、序列名和序列长度
 
+        # 预先记录整条序列中N的位置，窗口内N的个数可直接由两次二分查找得到，
+        # 不必先切出子序列再计数；不含N的序列（如hardmask拆分后的片段）跳过该步骤
+        if b'N' in sequence:
+            N_positions = np.flatnonzero(np.frombuffer(sequence, dtype=np.uint8) == ord('N'))
+        else:
+            N_positions = None
+
         # 当s小于n时，继续循环
         while s < n:
-            subseq = ''  # 初始化一个空字符串来存储子序列
             a = randint(0, 1)  # 随机生成0或1
             if a == 0:
                 # 如果a为0，那么子序列为从s开始的max_length个字符
-                subseq = sequence[s:s+max_length]
-                s += max_length  # 更新s的值
+                sublen = max_length
             else:
                 # 如果a为1，那么子序列的长度为min_length到max_length之间的随机数
                 sublen = randint(min_length, max_length)
-                subseq = sequence[s:s+sublen]
-                s += sublen  # 更新s的值
-            if len(subseq) >= min_length:
-                # 判断子序列中是否包含除A、C、G、T、N以外的字符
-                invalid_base = [char for char in subseq if char not in ['A', 'C', 'G', 'T', 'N']]
-                if len(invalid_base) > 0:
-                    continue
-                else:
-                    N_count = subseq.count('N')  # 统计子序列中N的个数
-                    if N_count / len(subseq) > 0.2:
+            start = s
+            end = min(s + sublen, n)
+            s += sublen  # 更新s的值
+
+            if end - start >= min_length:
+                # N的比例超过0.2的窗口直接丢弃，不再复制子序列
+                if N_positions is not None:
+                    N_count = np.searchsorted(N_positions, end) - np.searchsorted(N_positions, start)  # 统计窗口中N的个数
+                    if N_count / (end - start) > 0.2:
                         continue
-                    else:
-                        seqlist.append(subseq)  # 将子序列添加到seqlist中
 
-        return seqlist
+                subseq = sequence[start:end]
+                # 判断子序列中是否包含除A、C、G、T、N以外的字符（删除合法碱基后仍非空）
+                if subseq.translate(None, VALID_BASES):
+                    continue
+                yield subseq  # 逐条产生符合条件的子序列
+
+
+    def split_N_runs(self, sequence, min_N_run=10):
+        # 在连续10个及以上N处拆分序列（可能是大片段未拼装或masked重复序列）
+        if njit is not None:
+            # JIT编译的单次遍历只计算片段位置，再切出各片段
+            starts, ends = split_at_N_runs(np.frombuffer(sequence, dtype=np.uint8), min_N_run)
+            return [sequence[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+        # 未安装numba时用NumPy对N做游程编码，找出长度达到min_N_run的N游程
+        isN = np.frombuffer(sequence, dtype=np.uint8) == ord('N')
+        edges = np.diff(np.concatenate(([False], isN, [False])).view(np.int8))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        keep = run_ends - run_starts >= min_N_run
+        # 相邻两个长N游程之间即为需要保留的片段
+        starts = np.concatenate(([0], run_ends[keep]))
+        ends = np.concatenate((run_starts[keep], [len(sequence)]))
+        return [sequence[s:e] for s, e in zip(starts.tolist(), ends.tolist()) if e > s]
+
+
+    def sample_by_length(self, seqlist, total_len):
+        # 随机打乱子序列的顺序，依次选取直到累计长度达到total_len
+        listlen = len(seqlist)  # 获取seqlist的长度
+        arr = np.arange(listlen)
+        np.random.shuffle(arr)
 
+        # 用前缀和一次性找到累计长度首次达到total_len的位置
+        lengths = np.fromiter((len(seqlist[i]) for i in arr), dtype=np.int64, count=listlen)
+        cum = np.cumsum(lengths)
+        k = int(np.searchsorted(cum, total_len)) + 1
 
-    def get_all_HardMask(self, max_length=4000):
-        # 初始化一个空列表用于存储序列
-        seqlist = []
+        for i in arr[:k]:
+            yield seqlist[i]  # 按打乱后的顺序逐条产生选中的子序列
 
-        # 打开文件并读取内容
-        with open(self.SplitMask_genome_file_path) as inio:
-            # 循环读取文件的每一行
-            for line in inio:
-                # 去除行尾的换行符
-                line = line.rstrip()
-                # 将拆分的行添加到seqlist中
-                seqlist.extend(self.split_sequence(line, max_length=max_length))
 
-        # 返回包含所有序列的列表
-        return seqlist
+    def get_all_HardMask(self, max_length=4000):
+        # 内存映射读取文件的每一行（已去除行尾的换行符）
+        for line in read_lines_mmap(self.SplitMask_genome_file_path):
+            # 逐条产生拆分后的子序列
+            yield from self.split_sequence(line, max_length=max_length)
 
 
     def get_all_UnMask(self, max_length=4000):
 
-        fa = pyfastx.Fasta(self.UnMask_genome_file_path, build_index=True, uppercase=True)
-        seqlist = []  # 初始化一个空列表来存储子序列
-
-        for seq in fa:
-            sequence = seq.seq  # 获取序列
-            sequence = sequence.upper()  # 将序列转换为大写
-            # 替换连续超过10个N的序列为换行符（可能是大片段未拼装或masked重复序列）
-            pattern = "N" * 10 + "+"
-            sequences = re.sub(pattern, "\n", sequence).split("\n")
+        # 流式读取fasta文件，序列已转换为大写
+        for name, sequence in read_fasta(self.UnMask_genome_file_path):
+            # 在连续10个及以上N处拆分序列（可能是大片段未拼装或masked重复序列）
+            sequences = self.split_N_runs(sequence)
             # sequence = sequence.replace('N', '')  # 删除序列中的所有"N"
-            # 将拆分的行添加到seqlist中
+            # 逐条产生拆分后的子序列
             for sequence in sequences:
-                seqlist.extend(self.split_sequence(sequence, max_length=max_length))
-
-        return seqlist
+                yield from self.split_sequence(sequence, max_length=max_length)
 
     def get_SplitHardMask(self, total_len=250000000, max_length=4000):
         seqlist = []
         allseqlen = 0
-        with open(self.SplitMask_genome_file_path) as inio:
-            for line in inio:
-                line = line.rstrip()
-                seqlist.extend(self.split_sequence(line, max_length=max_length))
-                allseqlen += len(line)
+        for line in read_lines_mmap(self.SplitMask_genome_file_path):
+            seqlist.extend(self.split_sequence(line, max_length=max_length))
+            allseqlen += len(line)
         #print(f"total len {allseqlen}")
 
-        listlen = len(seqlist)  # 获取seqlist的长度
-        used = set()  # 初始化一个空列表来存储已经使用过的索引
-        sllength = 0  # 初始化一个变量sllength，用于追踪当前的长度
-        outlist = list()  # 初始化一个空列表来存储最终的输出
-
-        trytime = 0
-        # 当sllength小于total_len时，继续循环
-        arr = np.arange(listlen)
-        np.random.shuffle(arr)
-        randomlist = arr.tolist()
-
-        while sllength < total_len:
-            a =  randomlist.pop()
-            # 如果索引在used中，那么继续循环
-            if a in used:
-                continue
-            else:
-                # 如果a没有在used中，那么将seqlist[a]添加到outlist中，并更新sllength和used
-                outlist.append(seqlist[a])
-                sllength += len(seqlist[a])
-                used.add(a)
-
-            # if trytime % 10000==0:
-            #     print(f"{self.SplitMask_genome_file_path} try {trytime} time, now have {len(used)}, nowlen {sllength} ")
-
-            # trytime+=1
-
-        return outlist  # 返回outlist
+        yield from self.sample_by_length(seqlist, total_len)
 
 
     def get_SplitUnMask(self, total_len=250000000, max_length=4000):
 
-        # 使用pyfastx读取fasta文件，构建索引，并将所有序列转换为大写
-        fa = pyfastx.Fasta(self.UnMask_genome_file_path, build_index=True, uppercase=True)
         seqlist = []  # 初始化一个空列表来存储子序列
 
-        # 遍历fasta文件中的每一个序列
-        for seq in fa:
-            sequence = seq.seq  # 获取序列
-            sequence = sequence.upper()  # 将序列转换为大写
-            # 替换连续超过10个N的序列为换行符（可能是大片段未拼装或masked重复序列）
-            pattern = "N" * 10 + "+"
-            sequences = re.sub(pattern, "\n", sequence).split("\n")
+        # 流式读取fasta文件中的每一个序列，序列已转换为大写
+        for name, sequence in read_fasta(self.UnMask_genome_file_path):
+            # 在连续10个及以上N处拆分序列（可能是大片段未拼装或masked重复序列）
+            sequences = self.split_N_runs(sequence)
             # sequence = sequence.replace('N', '')  # 删除序列中的所有"N"
 
             # 将拆分的行添加到seqlist中
             for sequence in sequences:
                 seqlist.extend(self.split_sequence(sequence, max_length=max_length))
 
-        listlen = len(seqlist)  # 获取seqlist的长度
-        used = set()  # 初始化一个空列表来存储已经使用过的索引
-        sllength = 0  # 初始化一个变量sllength，用于追踪当前的长度
-        outlist = list()  # 初始化一个空列表来存储最终的输出
+        yield from self.sample_by_length(seqlist, total_len)
 
-        arr = np.arange(listlen)
-        np.random.shuffle(arr)
-        randomlist = arr.tolist()
 
-        while sllength < total_len:
-            a =  randomlist.pop()
-            # 如果索引在used中，那么继续循环
-            if a in used:
-                continue
-            else:
-                # 如果a没有在used中，那么将seqlist[a]添加到outlist中，并更新sllength和used
-                outlist.append(seqlist[a])
-                sllength += len(seqlist[a])
-                used.add(a)
+# 子进程共享的基因组信息表和基因组大小表，由init_worker设置
+genome_info_df = None
+genome_size_df = None
 
-        return outlist  # 返回outlist
 
+def init_worker(info_df, size_df):
+    global genome_info_df, genome_size_df
+    # 基因组信息表只在主进程读取一次，子进程直接复用
+    genome_info_df = info_df
+    genome_size_df = size_df
+    # fork出的子进程会继承相同的numpy随机数状态，这里重新设置随机种子
+    np.random.seed()
 
-def main():
 
-    # 解析命令行参数
-    args = parseArgs()
-    genomes_info_path = args.genomes_info_path
-    UnMaskDir = args.UnMaskDir
-    SplitMaskDir = args.SplitMaskDir
-    GenomeSizeFile = args.GenomeSizeFile
-    outfile = args.outfile
-    max_length = args.length
-    split_size = args.GenomeSplit
+def process_genome(genome_name, args_dict):
+    """
+    处理单个基因组，将生成的子序列写入临时文件，返回临时文件路径。
+
+    子序列不通过进程间通信传回主进程，避免序列化大量字符串。
+    """
+    print(genome_name)
+
+    # 创建Genome对象
+    Genome = GenomeObj(genome_info_df=genome_info_df, genome_size_df=genome_size_df, genome_name=genome_name,
+                       UnMaskDir=args_dict['UnMaskDir'], SplitMaskDir=args_dict['SplitMaskDir'],
+                       UnMaskIndex=args_dict['UnMaskIndex'])
 
-    # 读取基因组信息文件
-    df = pd.read_csv(GenomeSizeFile, sep='\t', index_col=0)
+    # 将judge_and_generate产生的子序列逐条写入临时文件，由1 MiB缓冲区合并写操作
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix=f'{genome_name}_', dir=args_dict['tmp_dir'])
+    try:
+        with os.fdopen(fd, 'wb', buffering=1 << 20) as out:
+            for seq in Genome.judge_and_generate(args_dict['split_size'], args_dict['max_length']):
+                out.write(seq)
+                out.write(b'\n')
+    except BaseException:
+        # 出错时删除写了一半的临时文件
+        os.remove(tmp_path)
+        raise
 
-    with open(outfile, 'w') as out:  # 使用with语句确保文件在操作完成后被正确关闭
-        for genome_name in df.index:
-            print(genome_name)
-            # 去除基因组名称中的后缀'.unmasked.fa'
-            #genome_name = genome_name.replace('.unmasked.fa', '')
+    return genome_name, tmp_path
 
-            # 创建Genome对象
-            Genome = GenomeObj(genomes_info_path = genomes_info_path, genome_name=genome_name, UnMaskDir=UnMaskDir, SplitMaskDir=SplitMaskDir, GenomeSizeFile=GenomeSizeFile)
 
-            # 调用Genome对象的judge_and_generate方法生成序列列表
-            total_seq_list = Genome.judge_and_generate(split_size, max_length)
+def process_genome_task(task):
+    return process_genome(*task)
+
+
+def main():
+
+    # 解析命令行参数
+    args = parseArgs()
+    outfile = args.outfile
 
-            # 将序列写入到输出文件中
-            for seq in total_seq_list:
-                out.write(seq + '\n')
+    args_dict = {
+        'UnMaskDir': args.UnMaskDir,
+        # unmasked目录只列出一次，建立 基因组名 -> 文件路径 的映射
+        'UnMaskIndex': index_genome_dir(args.UnMaskDir),
+        'SplitMaskDir': args.SplitMaskDir,
+        'max_length': args.length,
+        'split_size': args.GenomeSplit,
+        # 临时文件放在输出文件所在目录下本次运行专用的临时目录中
+        'tmp_dir': tempfile.mkdtemp(prefix='.corpus_tmp_', dir=os.path.dirname(os.path.abspath(outfile))),
+    }
+
+    # 读取基因组信息文件和基因组大小文件，只读取一次
+    info_df = pd.read_csv(args.genomes_info_path, sep='\t', index_col=0)
+    info_df.index = info_df.index.str.lower()
+    size_df = pd.read_csv(args.GenomeSizeFile, sep='\t', index_col=0)
+    genome_names = list(size_df.index)
+
+    # 各基因组互不相关，使用进程池并行生成语料
+    tmp_paths = {}
+    tasks = [(genome_name, args_dict) for genome_name in genome_names]
+    try:
+        with mp.Pool(max(1, min(args.threads, len(tasks))), initializer=init_worker,
+                     initargs=(info_df, size_df)) as pool:
+            for genome_name, tmp_path in pool.imap_unordered(process_genome_task, tasks, chunksize=1):
+                tmp_paths[genome_name] = tmp_path
+
+        # 按基因组顺序合并临时文件
+        with open(outfile, 'wb', buffering=1 << 20) as out:  # 使用with语句确保文件在操作完成后被正确关闭
+            for genome_name in genome_names:
+                with open(tmp_paths[genome_name], 'rb') as tmp:
+                    shutil.copyfileobj(tmp, out, 1 << 20)
+    finally:
+        # 整体删除临时目录，包括出错时其他进程已写出但未返回的临时文件
+        shutil.rmtree(args_dict['tmp_dir'], ignore_errors=True)
 
 
 if __name__ == "__main__":
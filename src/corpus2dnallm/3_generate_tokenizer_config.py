@@ -1,13 +1,22 @@
 import json
 import argparse
 import os
-import subprocess
+import sentencepiece as spm
+
+# orjson为可选依赖（C实现，读写JSON更快），未安装时使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def BPE_model_convert_to_merge_vocab_file(model_path, output_dir):
     """
     从指定的SentencePiece模型中提取词汇表和合并规则，并将它们保存到指定的文件中。
 
+    在当前进程中直接用sentencepiece读取模型，不再启动新的Python解释器；
+    输出格式与sentencepiece_extractor.py一致。
+
     参数:
     - model_path: SentencePiece模型的路径。
     - output_dir: 输出目录。
@@ -17,15 +26,51 @@ def BPE_model_convert_to_merge_vocab_file(model_path, output_dir):
 
     merges_output_dir = os.path.join(output_dir, 'merges.txt')
 
-    command = f"python sentencepiece_extractor.py --provider sentencepiece --model {model_path} --vocab-output-path {vocab_output_dir} --merges-output-path {merges_output_dir}"
+    sp = spm.SentencePieceProcessor()
+    sp.load(model_path)
+
+    pieces = sp.id_to_piece(list(range(sp.get_piece_size())))
+    vocab = {piece: index for index, piece in enumerate(pieces)}
+
+    # 合并规则: 所有可由词表中两个token拼接得到的词表token，按合并结果的id排序。
+    # 枚举每个token的拆分位置，而不是两两组合整个词表
+    merges = []
+    for piece, piece_id in vocab.items():
+        if piece_id == 0:
+            continue
+        for k in range(1, len(piece)):
+            piece_l, piece_r = piece[:k], piece[k:]
+            if piece_l in vocab and piece_r in vocab:
+                merges.append((piece_id, vocab[piece_l], vocab[piece_r], piece_l, piece_r))
+    merges.sort()
+
+    with open(vocab_output_dir, 'w', encoding='utf-8') as vocab_f:
+        json.dump(vocab, vocab_f)
+
+    with open(merges_output_dir, 'w', encoding='utf-8') as merges_f:
+        merges_f.writelines(f"{piece_l} {piece_r}\n" for _, _, _, piece_l, piece_r in merges)
+
+    print("merge and vocab files have been successfully extracted.")
+
+
+def load_json(path):
+    """读取JSON文件，安装了orjson时使用orjson解析。"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_json(obj, path):
+    """写入JSON文件（保留非ASCII字符并缩进），安装了orjson时使用orjson序列化。"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
 
-    # 使用subprocess运行命令
-    try:
-        subprocess.run(command, shell=True, check=True)
-        print("merge and vocab files have been successfully extracted.")
-    except subprocess.CalledProcessError as e:
-        print(f"Failed: {e}")
-    
 
 def update_tokenizer_files(special_token_file, example_config_file, example_tokenizer_file, output_dir):
 
@@ -34,19 +79,15 @@ def update_tokenizer_files(special_token_file, example_config_file, example_toke
     merge_file = os.path.join(output_dir, 'merges.txt')
 
     # 加载vocab文件
-    with open(vocab_file, 'r', encoding='utf-8') as f:
-        vocab = json.load(f)
+    vocab = load_json(vocab_file)
 
-    # 读取并处理merges文件
-    merge_list = []
+    # 一次读入merges文件后按行拆分
     with open(merge_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            merge_list.append(line.strip())
+        merge_list = [line.strip() for line in f.read().splitlines()]
 
     # 加载特殊标记文件，如果不存在则使用默认的特殊标记
     if os.path.exists(special_token_file):
-        with open(special_token_file, 'r', encoding='utf-8') as f:
-            special_token = json.load(f)
+        special_token = load_json(special_token_file)
     else:
         special_token = {
             '<|endoftext|>': 0,
@@ -54,11 +95,9 @@ def update_tokenizer_files(special_token_file, example_config_file, example_toke
         }
 
     # 加载示例配置和分词器文件
-    with open(example_config_file, 'r', encoding='utf-8') as f:
-        example_config = json.load(f)
+    example_config = load_json(example_config_file)
 
-    with open(example_tokenizer_file, 'r', encoding='utf-8') as f:
-        example_tokenizer = json.load(f)
+    example_tokenizer = load_json(example_tokenizer_file)
 
     # 修改配置文件的added_tokens_decoder属性
     added_tokens_decoder = {}
@@ -122,11 +161,9 @@ def update_tokenizer_files(special_token_file, example_config_file, example_toke
     output_tokenizer_file = os.path.join(output_dir, 'tokenizer.json')
 
     # 写入修改后的配置和分词器文件
-    with open(output_config_file, 'w', encoding='utf-8') as f:
-        json.dump(example_config, f, ensure_ascii=False, indent=4)
+    dump_json(example_config, output_config_file)
 
-    with open(output_tokenizer_file, 'w', encoding='utf-8') as f:
-        json.dump(example_tokenizer, f, ensure_ascii=False, indent=4)
+    dump_json(example_tokenizer, output_tokenizer_file)
 
 def main():
     # 创建命令行参数解析器
@@ -10,15 +10,13 @@ Corpus2DNALLM - 基因组数据转换为DNA语言模型训练数据的CLI工具
 """
 
 import argparse
+import logging
 import sys
 import os
 from pathlib import Path
 
-# 导入重构后的模块
-from . import genome_size
-from . import corpus_prep
-from . import tokenizer_train
-from . import config_gen
+# 各功能模块依赖pandas、pyfastx、sentencepiece等较重的库，
+# 在对应的子命令中再导入，使 --help 等只解析参数的调用保持轻量
 
 
 def create_parser():
@@ -38,39 +36,98 @@ def create_parser():
 
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
 
-    # prepare-genome 子命令
-    genome_parser = subparsers.add_parser(
-        'prepare-genome',
-        help='检查基因组文件并生成大小统计'
-    )
-    genome_parser.add_argument(
+    # 多个子命令共用的参数定义在父解析器中，子命令通过parents复用
+    # 基因组输入输出参数：prepare-genome 和 all
+    genome_io_parent = argparse.ArgumentParser(add_help=False)
+    genome_io_parent.add_argument(
         '--genomes-info-path',
         type=str,
         required=True,
         help='包含基因组名称和类型的TSV文件路径'
     )
-    genome_parser.add_argument(
+    genome_io_parent.add_argument(
         '--masked-dir',
         type=str,
         required=True,
         help='hardmasked基因组文件所在目录'
     )
-    genome_parser.add_argument(
+    genome_io_parent.add_argument(
         '--unmasked-dir',
         type=str,
         required=True,
         help='unmasked基因组文件所在目录'
     )
-    genome_parser.add_argument(
+    genome_io_parent.add_argument(
         '--output-dir',
         type=str,
         required=True,
         help='输出文件目录'
     )
 
+    # 语料拆分参数：prepare-corpus 和 all
+    split_parent = argparse.ArgumentParser(add_help=False)
+    split_parent.add_argument(
+        '--max-seq-length',
+        type=int,
+        default=4000,
+        help='拆分序列的最大长度 (默认: 4000)'
+    )
+    split_parent.add_argument(
+        '--genome-split-size',
+        type=int,
+        default=500,
+        help='拆分Unmasked基因组的最大长度(MB) (默认: 500)'
+    )
+    split_parent.add_argument(
+        '--min-seq-length',
+        type=int,
+        default=100,
+        help='过滤后的最小序列长度 (默认: 100)'
+    )
+
+    # 并行参数：prepare-genome、prepare-corpus 和 all
+    # 每个进程同时持有一条完整染色体，内存不足时应调小
+    workers_parent = argparse.ArgumentParser(add_help=False)
+    workers_parent.add_argument(
+        '--num-workers',
+        type=int,
+        default=None,
+        help='并行处理基因组的进程数 (默认: CPU核数)'
+    )
+
+    # 分词器训练参数：train-tokenizer 和 all
+    train_parent = argparse.ArgumentParser(add_help=False)
+    train_parent.add_argument(
+        '--vocab-size',
+        type=int,
+        default=8192,
+        help='词汇表大小 (默认: 8192)'
+    )
+    train_parent.add_argument(
+        '--model-type',
+        type=str,
+        default='bpe',
+        choices=['bpe', 'unigram', 'word', 'char'],
+        help='模型类型 (默认: bpe)'
+    )
+    train_parent.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='训练时使用的线程数 (默认: CPU核数)'
+    )
+
+    # prepare-genome 子命令
+    subparsers.add_parser(
+        'prepare-genome',
+        parents=[genome_io_parent, workers_parent],
+        help='检查基因组文件并生成大小统计'
+    )
+
     # prepare-corpus 子命令
     corpus_parser = subparsers.add_parser(
         'prepare-corpus',
+        parents=[split_parent, workers_parent],
         help='准备基因组语料库'
     )
     corpus_parser.add_argument(
@@ -103,35 +160,18 @@ def create_parser():
         required=True,
         help='输出语料库文件路径'
     )
-    corpus_parser.add_argument(
-        '--max-seq-length',
-        type=int,
-        default=4000,
-        help='拆分序列的最大长度 (默认: 4000)'
-    )
-    corpus_parser.add_argument(
-        '--genome-split-size',
-        type=int,
-        default=500,
-        help='拆分Unmasked基因组的最大长度(MB) (默认: 500)'
-    )
-    corpus_parser.add_argument(
-        '--min-seq-length',
-        type=int,
-        default=100,
-        help='过滤后的最小序列长度 (默认: 100)'
-    )
 
     # train-tokenizer 子命令
     tokenizer_parser = subparsers.add_parser(
         'train-tokenizer',
+        parents=[train_parent],
         help='训练BPE分词器'
     )
     tokenizer_parser.add_argument(
         '--input-file',
         type=str,
         required=True,
-        help='包含训练文本数据的输入文件路径'
+        help='包含训练文本数据的输入文件路径（也可以是逗号分隔的多个文件、目录或通配符模式；目录只使用其中的.txt语料文件）'
     )
     tokenizer_parser.add_argument(
         '--model-prefix',
@@ -139,25 +179,6 @@ def create_parser():
         required=True,
         help='生成模型文件的前缀'
     )
-    tokenizer_parser.add_argument(
-        '--vocab-size',
-        type=int,
-        default=8192,
-        help='词汇表大小 (默认: 8192)'
-    )
-    tokenizer_parser.add_argument(
-        '--model-type',
-        type=str,
-        default='bpe',
-        choices=['bpe', 'unigram', 'word', 'char'],
-        help='模型类型 (默认: bpe)'
-    )
-    tokenizer_parser.add_argument(
-        '--num-threads',
-        type=int,
-        default=4,
-        help='训练时使用的线程数 (默认: 4)'
-    )
 
     # generate-config 子命令
     config_parser = subparsers.add_parser(
@@ -197,68 +218,23 @@ def create_parser():
     # all 子命令 - 执行完整流程
     all_parser = subparsers.add_parser(
         'all',
+        parents=[genome_io_parent, split_parent, workers_parent, train_parent],
         help='执行完整的基因组数据处理流程'
     )
     all_parser.add_argument(
-        '--genomes-info-path',
-        type=str,
-        required=True,
-        help='包含基因组名称和类型的TSV文件路径'
-    )
-    all_parser.add_argument(
-        '--masked-dir',
-        type=str,
-        required=True,
-        help='hardmasked基因组文件所在目录'
-    )
-    all_parser.add_argument(
-        '--unmasked-dir',
+        '--example-config-file',
         type=str,
-        required=True,
-        help='unmasked基因组文件所在目录'
+        help='示例tokenizer配置文件路径 (可选，与--example-tokenizer-file同时提供时生成配置文件)'
     )
     all_parser.add_argument(
-        '--output-dir',
+        '--example-tokenizer-file',
         type=str,
-        required=True,
-        help='输出文件目录'
-    )
-    all_parser.add_argument(
-        '--max-seq-length',
-        type=int,
-        default=4000,
-        help='拆分序列的最大长度 (默认: 4000)'
-    )
-    all_parser.add_argument(
-        '--genome-split-size',
-        type=int,
-        default=500,
-        help='拆分Unmasked基因组的最大长度(MB) (默认: 500)'
-    )
-    all_parser.add_argument(
-        '--min-seq-length',
-        type=int,
-        default=100,
-        help='过滤后的最小序列长度 (默认: 100)'
+        help='示例tokenizer文件路径 (可选，与--example-config-file同时提供时生成配置文件)'
     )
     all_parser.add_argument(
-        '--vocab-size',
-        type=int,
-        default=8192,
-        help='词汇表大小 (默认: 8192)'
-    )
-    all_parser.add_argument(
-        '--model-type',
+        '--special-token-file',
         type=str,
-        default='bpe',
-        choices=['bpe', 'unigram', 'word', 'char'],
-        help='模型类型 (默认: bpe)'
-    )
-    all_parser.add_argument(
-        '--num-threads',
-        type=int,
-        default=4,
-        help='训练时使用的线程数 (默认: 4)'
+        help='特殊标记JSON文件路径 (可选)'
     )
 
     return parser
@@ -268,6 +244,8 @@ def run_prepare_genome(args):
     """执行基因组准备步骤"""
     print("开始基因组文件检查和大小统计...")
 
+    from . import genome_size
+
     # 创建输出目录
     os.makedirs(args.output_dir, exist_ok=True)
 
@@ -280,11 +258,13 @@ def run_prepare_genome(args):
         genome_size.write_genome_sizes(
             args.genomes_info_path,
             args.unmasked_dir,
-            args.output_dir
+            args.output_dir,
+            num_workers=args.num_workers
         )
 
         split_mask_dir = os.path.join(args.output_dir, 'hardmask_split')
-        genome_size.split_hardmask_genome(args.masked_dir, args.output_dir, args.genomes_info_path)
+        genome_size.split_hardmask_genome(args.masked_dir, args.output_dir, args.genomes_info_path,
+                                          num_workers=args.num_workers)
 
         print(f"基因组统计完成，结果保存在: {args.output_dir}")
         return True
@@ -297,6 +277,8 @@ def run_prepare_corpus(args):
     """执行语料库准备步骤"""
     print("开始准备基因组语料库...")
 
+    from . import corpus_prep
+
     # 调用新的模块化功能
     corpus_prep.prepare_genome_corpus(
         args.genomes_info_path,
@@ -306,7 +288,8 @@ def run_prepare_corpus(args):
         args.output_file,
         args.max_seq_length,
         args.genome_split_size,
-        args.min_seq_length
+        args.min_seq_length,
+        num_workers=args.num_workers
     )
 
     print(f"语料库准备完成，结果保存在: {args.output_file}")
@@ -316,6 +299,8 @@ def run_train_tokenizer(args):
     """执行分词器训练步骤"""
     print("开始训练BPE分词器...")
 
+    from . import tokenizer_train
+
     # 调用新的模块化功能
     success = tokenizer_train.train_sentencepiece_model(
         args.input_file,
@@ -340,6 +325,8 @@ def run_generate_config(args):
     """执行配置生成步骤"""
     print("开始生成分词器配置文件...")
 
+    from . import config_gen
+
     # 调用新的模块化功能
     success = config_gen.generate_all_config_files(
         args.model_path,
@@ -379,7 +366,8 @@ def run_all(args):
         output_file=corpus_file,
         max_seq_length=args.max_seq_length,
         genome_split_size=args.genome_split_size,
-        min_seq_length=args.min_seq_length
+        min_seq_length=args.min_seq_length,
+        num_workers=args.num_workers
     )
     run_prepare_corpus(corpus_args)
 
@@ -393,20 +381,18 @@ def run_all(args):
     )
     run_train_tokenizer(tokenizer_args)
 
-    # 步骤4: 生成配置文件
-    config_args = argparse.Namespace(
-        model_path=f"{model_prefix}.model",
-        special_token_file=None,  # 可选参数
-        example_config_file=None,  # 需要用户提供
-        example_tokenizer_file=None,  # 需要用户提供
-        output_dir=args.output_dir
-    )
-
-    # 如果示例文件不存在，跳过配置生成步骤
-    if config_args.example_config_file is None:
+    # 步骤4: 生成配置文件，需要同时提供两个示例文件，否则跳过
+    if args.example_config_file is None or args.example_tokenizer_file is None:
         print("警告: 未提供示例配置文件，跳过配置文件生成步骤")
         print("请使用 'corpus2dnallm generate-config --help' 查看如何手动生成配置文件")
     else:
+        config_args = argparse.Namespace(
+            model_path=f"{model_prefix}.model",
+            special_token_file=args.special_token_file,  # 可选参数
+            example_config_file=args.example_config_file,
+            example_tokenizer_file=args.example_tokenizer_file,
+            output_dir=args.output_dir
+        )
         run_generate_config(config_args)
 
     print(f"完整流程执行完成！所有结果保存在: {args.output_dir}")
@@ -421,6 +407,9 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    # 配置日志（各模块只获取logger，不自行配置）
+    logging.basicConfig(level=logging.INFO)
+
     try:
         if args.command == 'prepare-genome':
             run_prepare_genome(args)
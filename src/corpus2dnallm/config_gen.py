@@ -5,44 +5,105 @@
 """
 
 import json
-import sentencepiece as spm
 import os
 
+# orjson为可选依赖（C实现，读写JSON更快），未安装时使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def extract_vocab_and_merges(model_path, output_dir):
+# 不写入词汇表的特殊token
+SPECIAL_PIECES = frozenset(('<unk>', '<s>', '</s>', '<pad>'))
+
+
+def load_json(path):
+    """
+    读取JSON文件，安装了orjson时使用orjson解析
+
+    Args:
+        path (str): JSON文件路径
+
+    Returns:
+        解析得到的对象
+    """
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_json(obj, path, compact=False):
+    """
+    以缩进2格、保留非ASCII字符的格式写入JSON文件，安装了orjson时使用orjson序列化
+
+    Args:
+        obj: 要写入的对象
+        path (str): 输出文件路径
+        compact (bool): 是否使用不含缩进和空格的紧凑格式
+    """
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj) if compact else orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        if compact:
+            json.dump(obj, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+def load_sentencepiece_model(model_path):
+    """
+    加载SentencePiece模型
+
+    Args:
+        model_path (str): SentencePiece模型文件路径
+
+    Returns:
+        SentencePieceProcessor: 已加载的模型
+    """
+    # 延迟导入sentencepiece，只在实际使用时付出导入开销
+    import sentencepiece as spm
+
+    sp = spm.SentencePieceProcessor()
+    sp.load(model_path)
+    return sp
+
+
+def extract_vocab_and_merges(model_path, output_dir, sp=None):
     """
     从SentencePiece模型中提取词汇表和合并规则
 
     Args:
         model_path (str): SentencePiece模型文件路径
         output_dir (str): 输出目录
+        sp (SentencePieceProcessor): 已加载的模型(可选)，未提供时从model_path加载
 
     Returns:
         bool: 是否成功
     """
     try:
         # 加载SentencePiece模型
-        sp = spm.SentencePieceProcessor()
-        sp.load(model_path)
-
-        # 提取词汇表
-        vocab = {}
-        merges = []
-        for i in range(sp.get_piece_size()):
-            piece = sp.id_to_piece(i)
-            score = sp.get_score(i)
-
-            # 跳过特殊token的合并规则
-            if piece not in ['<unk>', '<s>', '</s>', '<pad>']:
-                vocab[piece] = i
-                # 对于BPE，分数表示合并的优先级
-                if '▁' not in piece and len(piece) > 1:
-                    merges.append(f"{piece} {score:.6f}")
+        if sp is None:
+            sp = load_sentencepiece_model(model_path)
+
+        # 提取词汇表，id_to_piece和get_score接受列表，一次调用取回全部token
+        ids = list(range(sp.get_piece_size()))
+        pieces = sp.id_to_piece(ids)
+        scores = sp.get_score(ids)
+
+        # 跳过特殊token的合并规则
+        vocab = {piece: i for i, piece in enumerate(pieces) if piece not in SPECIAL_PIECES}
+        # 对于BPE，分数表示合并的优先级
+        merges = [f"{piece} {score:.6f}" for piece, score in zip(pieces, scores)
+                  if piece not in SPECIAL_PIECES and '▁' not in piece and len(piece) > 1]
 
         # 写入词汇表文件
         vocab_file = os.path.join(output_dir, 'vocab.json')
-        with open(vocab_file, 'w', encoding='utf-8') as f:
-            json.dump(vocab, f, ensure_ascii=False, indent=2)
+        # 词汇表只供程序读取，使用紧凑格式减小文件和序列化开销
+        dump_json(vocab, vocab_file, compact=True)
 
         # 写入合并规则文件
         merges_file = os.path.join(output_dir, 'merges.txt')
@@ -61,7 +122,7 @@ def extract_vocab_and_merges(model_path, output_dir):
 
 
 def generate_tokenizer_config(model_path, example_config_file, output_dir,
-                             special_token_file=None):
+                             special_token_file=None, sp=None):
     """
     生成tokenizer配置文件
 
@@ -70,6 +131,7 @@ def generate_tokenizer_config(model_path, example_config_file, output_dir,
         example_config_file (str): 示例配置文件路径
         output_dir (str): 输出目录
         special_token_file (str): 特殊token文件路径(可选)
+        sp (SentencePieceProcessor): 已加载的模型(可选)，未提供时从model_path加载
 
     Returns:
         bool: 是否成功
@@ -77,15 +139,14 @@ def generate_tokenizer_config(model_path, example_config_file, output_dir,
     try:
         # 加载示例配置文件
         if os.path.exists(example_config_file):
-            with open(example_config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            config = load_json(example_config_file)
         else:
             # 创建默认配置
             config = create_default_config()
 
-        # 加载SentencePiece模型获取信息
-        sp = spm.SentencePieceProcessor()
-        sp.load(model_path)
+        # 加载模型获取信息
+        if sp is None:
+            sp = load_sentencepiece_model(model_path)
 
         # 更新配置
         config.update({
@@ -110,9 +171,8 @@ def generate_tokenizer_config(model_path, example_config_file, output_dir,
 
         # 如果提供了特殊token文件，使用文件中的定义
         if special_token_file and os.path.exists(special_token_file):
-            with open(special_token_file, 'r', encoding='utf-8') as f:
-                file_special_tokens = json.load(f)
-                special_tokens.update(file_special_tokens)
+            file_special_tokens = load_json(special_token_file)
+            special_tokens.update(file_special_tokens)
 
         # 更新配置中的特殊token
         config["unk_token"] = special_tokens["unk_token"]
@@ -123,8 +183,7 @@ def generate_tokenizer_config(model_path, example_config_file, output_dir,
 
         # 写入配置文件
         config_file = os.path.join(output_dir, 'tokenizer_config.json')
-        with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        dump_json(config, config_file)
 
         print(f"Tokenizer配置文件已生成: {config_file}")
         return True
@@ -151,8 +210,7 @@ def generate_tokenizer_json(model_path, example_tokenizer_file, output_dir,
     try:
         # 加载示例tokenizer文件
         if os.path.exists(example_tokenizer_file):
-            with open(example_tokenizer_file, 'r', encoding='utf-8') as f:
-                tokenizer_data = json.load(f)
+            tokenizer_data = load_json(example_tokenizer_file)
         else:
             # 创建默认tokenizer结构
             tokenizer_data = create_default_tokenizer_data()
@@ -163,14 +221,12 @@ def generate_tokenizer_json(model_path, example_tokenizer_file, output_dir,
 
         # 处理特殊token
         if special_token_file and os.path.exists(special_token_file):
-            with open(special_token_file, 'r', encoding='utf-8') as f:
-                special_tokens = json.load(f)
+            special_tokens = load_json(special_token_file)
             update_special_tokens_in_tokenizer(tokenizer_data, special_tokens)
 
         # 写入tokenizer.json文件
         tokenizer_file = os.path.join(output_dir, 'tokenizer.json')
-        with open(tokenizer_file, 'w', encoding='utf-8') as f:
-            json.dump(tokenizer_data, f, ensure_ascii=False, indent=2)
+        dump_json(tokenizer_data, tokenizer_file)
 
         print(f"Tokenizer文件已生成: {tokenizer_file}")
         return True
@@ -309,12 +365,19 @@ def generate_all_config_files(model_path, example_config_file, example_tokenizer
     """
     success = True
 
+    # 只加载一次模型，供后续步骤共用；加载失败时由各步骤分别报告
+    try:
+        sp = load_sentencepiece_model(model_path)
+    except Exception as e:
+        print(f"加载SentencePiece模型失败: {e}")
+        sp = None
+
     # 生成词汇表和合并规则
-    success &= extract_vocab_and_merges(model_path, output_dir)
+    success &= extract_vocab_and_merges(model_path, output_dir, sp)
 
     # 生成tokenizer配置文件
     success &= generate_tokenizer_config(
-        model_path, example_config_file, output_dir, special_token_file
+        model_path, example_config_file, output_dir, special_token_file, sp
     )
 
     # 生成tokenizer.json文件
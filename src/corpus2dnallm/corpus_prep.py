@@ -5,12 +5,32 @@
 """
 
 import os
-import glob
+import bisect
+import csv
+import mmap
+import shutil
+import functools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 import pyfastx
-from glob import glob
 import fnmatch
 import numpy as np
-import pandas as pd
+
+# numba为可选依赖，安装后使用JIT编译的拆分循环
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# 每次批量写入的子序列条数
+WRITE_BATCH = 4096
+
+# chunk_sequence的NumPy实现每批处理的窗口行数
+CHUNK_ROWS = 1024
+
+# 小写字母到大写字母的转换表，DNA序列按bytes大写化，无需解码为str
+UPPER_TABLE = bytes.maketrans(b'abcdefghijklmnopqrstuvwxyz', b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
 
 
 def process_sequence(sequence, min_length):
@@ -18,14 +38,14 @@ def process_sequence(sequence, min_length):
     处理序列：替换N为空白并检查长度
 
     Args:
-        sequence (str): 原始序列
+        sequence (bytes): 原始序列
         min_length (int): 最小序列长度
 
     Returns:
-        str: 处理后的序列，如果不符合要求返回None
+        bytes: 处理后的序列，如果不符合要求返回None
     """
     # 将所有N或n替换为空白
-    processed_seq = sequence.replace('N', '').replace('n', '')
+    processed_seq = sequence.replace(b'N', b'').replace(b'n', b'')
 
     # 检查处理后的序列长度
     if len(processed_seq) < min_length:
@@ -34,12 +54,188 @@ def process_sequence(sequence, min_length):
     return processed_seq
 
 
+def load_tsv(path):
+    """
+    读取以制表符分隔的表格文件，第一列为基因组名称
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        dict: 小写基因组名称 -> 该行内容（列名 -> 值）的字典，保持文件中的顺序
+    """
+    table = {}
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f, delimiter='\t')
+        for row in reader:
+            table[next(iter(row.values())).lower()] = row
+    return table
+
+
+def read_lines_mmap(path):
+    """
+    以内存映射方式读取文本文件，逐行返回去除首尾空白的bytes
+
+    换行符的查找在mmap上以C速度完成，不经过Python的缓冲读取器。
+
+    Args:
+        path (str): 文件路径
+
+    Yields:
+        bytes: 每一行的内容
+    """
+    # 空文件无法映射
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        size = len(mm)
+        while start < size:
+            end = mm.find(b'\n', start)
+            if end == -1:
+                end = size
+            yield mm[start:end].strip()
+            start = end + 1
+
+
+def chunk_sequence_kernel(arr, max_length, min_length):
+    """
+    chunk_sequence的逐字节实现，只在安装了numba时使用（JIT编译）
+
+    单次遍历每个窗口：先统计非N碱基数，被接受的窗口再把非N碱基复制到输出数组。
+
+    Args:
+        arr (np.ndarray): uint8序列
+        max_length (int): 最大序列长度
+        min_length (int): 最小序列长度
+
+    Returns:
+        tuple: (片段以换行符连接后的uint8数组, 各片段长度的数组)
+    """
+    n = arr.shape[0]
+    nrows = (n + max_length - 1) // max_length
+    out = np.empty(n + nrows, dtype=np.uint8)
+    lengths = np.empty(nrows, dtype=np.int64)
+    pos = 0
+    k = 0
+    for start in range(0, n, max_length):
+        end = min(start + max_length, n)
+        count = 0
+        for i in range(start, end):
+            if arr[i] != 78:  # N
+                count += 1
+        if count >= min_length:
+            if k > 0:
+                out[pos] = 10  # 换行符
+                pos += 1
+            for i in range(start, end):
+                if arr[i] != 78:
+                    out[pos] = arr[i]
+                    pos += 1
+            lengths[k] = count
+            k += 1
+    return out[:pos], lengths[:k]
+
+
+if njit is not None:
+    chunk_sequence_kernel = njit(cache=True)(chunk_sequence_kernel)
+
+
+def chunk_sequence(sequence, max_length, min_length):
+    """
+    向量化拆分序列：按max_length切分，去除每段中的N并保留长度达到要求的片段
+
+    与逐段调用process_sequence的结果相同，但切分、计数和过滤都由NumPy完成；
+    窗口按批处理，除输出数组外临时内存与序列长度无关。
+
+    Args:
+        sequence (bytes): 大写的原始序列
+        max_length (int): 最大序列长度
+        min_length (int): 最小序列长度
+
+    Returns:
+        tuple: (片段以换行符连接后的uint8数组（末尾无换行符）, 各片段长度的数组)
+    """
+    arr = np.frombuffer(sequence, dtype=np.uint8)
+    n = len(arr)
+    if n == 0:
+        return np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64)
+
+    if njit is not None:
+        # 安装了numba时使用JIT编译的逐字节循环，输出数组按序列长度一次性分配
+        return chunk_sequence_kernel(arr, max_length, min_length)
+
+    # 输出数组按序列长度一次性分配（片段总长不超过n，换行符不超过片段数）
+    nrows = -(-n // max_length)
+    out = np.empty(n + nrows, dtype=np.uint8)
+    lengths = np.empty(nrows, dtype=np.int64)
+    pos = 0
+    k = 0
+
+    # 完整的窗口reshape为(行数, max_length)的视图，按CHUNK_ROWS行一批处理，
+    # 临时数组只与一批行的大小相当；末尾不足max_length的窗口单独作为一行
+    nfull = n // max_length
+    batches = [arr[start * max_length:min(start + CHUNK_ROWS, nfull) * max_length].reshape(-1, max_length)
+               for start in range(0, nfull, CHUNK_ROWS)]
+    if n > nfull * max_length:
+        batches.append(arr[nfull * max_length:].reshape(1, -1))
+
+    for rows in batches:
+        width = rows.shape[1]
+        is_n = rows == ord('N')
+        # 每行去除N后的长度
+        row_lengths = width - is_n.sum(axis=1)
+        accepted = row_lengths >= min_length
+        kb = int(accepted.sum())
+        if kb == 0:
+            continue
+        row_lengths = row_lengths[accepted]
+        size = int(row_lengths.sum()) + kb
+        dst = out[pos:pos + size]
+
+        if size == kb * (width + 1):
+            # 被接受的行都不含N：整行复制，末尾追加一列换行符
+            dst = dst.reshape(kb, width + 1)
+            dst[:, :width] = rows[accepted]
+            dst[:, width] = ord(b'\n')
+        else:
+            # 去除N后各片段长度不同，在每个片段之后的位置写换行符，其余位置依次填入非N碱基
+            is_newline = np.zeros(size, dtype=bool)
+            is_newline[np.cumsum(row_lengths + 1) - 1] = True
+            dst[is_newline] = ord(b'\n')
+            dst[~is_newline] = rows[accepted][~is_n[accepted]]
+
+        lengths[k:k + kb] = row_lengths
+        k += kb
+        pos += size
+
+    # 去掉最后一个片段之后的换行符
+    return out[:max(pos - 1, 0)], lengths[:k]
+
+
+def flush_sequences(buf, outfile):
+    """
+    将缓存的子序列拼接后一次写入输出文件，并清空缓存
+
+    Args:
+        buf (list): 缓存的子序列
+        outfile: 输出文件句柄（二进制模式）
+    """
+    if buf:
+        outfile.write(b'\n'.join(buf))
+        outfile.write(b'\n')
+        buf.clear()
+
+
 def prepare_genome_corpus(genomes_info_path, unmasked_dir, split_mask_dir,
                          genome_size_file, output_file, max_length=4000,
-                         genome_split_size=500, min_seq_length=100):
+                         genome_split_size=500, min_seq_length=100, num_workers=None):
     """
     准备基因组语料库
 
+    各基因组互不相关，由进程池并行处理，每个基因组写入各自的临时分片文件，
+    全部完成后按基因组信息文件中的顺序合并到输出文件。
+
     Args:
         genomes_info_path (str): 包含基因组名称的文件路径
         unmasked_dir (str): unmasked基因组文件目录
@@ -49,36 +245,81 @@ def prepare_genome_corpus(genomes_info_path, unmasked_dir, split_mask_dir,
         max_length (int): 拆分序列的最长长度，默认为4000
         genome_split_size (int): 拆分Unmasked基因组的最大长度(MB)，默认为500
         min_seq_length (int): 过滤后的最小序列长度，默认为100
+        num_workers (int): 并行处理的进程数，默认为CPU核数
     """
-    # 读取基因组信息
-    genome_df = pd.read_csv(genomes_info_path, sep='\t', index_col=0)
-    # 保留原始大小写，但同时创建小写版本用于索引
-    original_index = genome_df.index.copy()
-    genome_df.index = genome_df.index.to_series().str.lower()
+    # 读取基因组信息，键为小写名称，行内第一列保留原始大小写
+    genome_info = load_tsv(genomes_info_path)
 
     # 读取基因组大小信息
-    size_df = pd.read_csv(genome_size_file, sep='\t', index_col=0)
-
-    # 打开输出文件
-    with open(output_file, 'w') as outfile:
-        for i, genome_name in enumerate(genome_df.index):
-            genome_name_original = original_index[i]
-            genome_type = genome_df.loc[genome_name, 'genome_type']
-            genome_size = size_df.loc[genome_name, 'sum_len']
-            genome_size_mb = genome_size / (1024 * 1024)  # 转换为MB
-
-            print(f"处理基因组: {genome_name} (大小: {genome_size_mb:.2f} MB)")
-
-            if genome_type == 'both':
-                # 处理有masked和unmasked两种类型的基因组
-                process_both_types(genome_name, genome_name_original, unmasked_dir, split_mask_dir,
-                                  genome_size_mb, genome_split_size,
-                                  max_length, outfile, min_seq_length)
-            else:
-                # 只处理unmasked基因组
-                process_unmasked_only(genome_name, genome_name_original, unmasked_dir,
-                                    genome_size_mb, genome_split_size,
-                                    max_length, outfile, min_seq_length)
+    size_info = load_tsv(genome_size_file)
+
+    # 分片文件放在输出文件所在目录下本次运行专用的临时目录中，结束时（包括出错时）整体删除
+    shard_dir = tempfile.mkdtemp(prefix='.corpus_shards_',
+                                 dir=os.path.dirname(os.path.abspath(output_file)))
+
+    # 在创建进程池之前列出一次两个输入目录，fork出的子进程直接继承缓存的目录列表
+    scan_dir(unmasked_dir)
+    index_split_mask_dir(split_mask_dir)
+
+    tasks = []
+    for genome_name, row in genome_info.items():
+        genome_name_original = next(iter(row.values()))
+        genome_type = row['genome_type']
+        genome_size = int(size_info[genome_name]['sum_len'])
+        genome_size_mb = genome_size / (1024 * 1024)  # 转换为MB
+
+        tasks.append((genome_name, genome_name_original, genome_type, genome_size_mb,
+                      unmasked_dir, split_mask_dir, genome_split_size, max_length,
+                      min_seq_length, shard_dir))
+
+    shard_paths = []
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+            # executor.map按提交顺序返回结果，保证合并顺序与输入一致
+            for shard_path in executor.map(process_one_genome, tasks):
+                shard_paths.append(shard_path)
+
+        # 以二进制方式打开输出文件，按顺序合并各分片
+        with open(output_file, 'wb', buffering=16 * 1024 * 1024) as outfile:
+            for shard_path in shard_paths:
+                with open(shard_path, 'rb') as shard:
+                    shutil.copyfileobj(shard, outfile, 8 * 1024 * 1024)
+    finally:
+        # 某个基因组出错时，其余子进程已写出但未返回的分片也一并删除
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def process_one_genome(task):
+    """
+    在子进程中处理单个基因组，将语料写入临时分片文件
+
+    Args:
+        task (tuple): 基因组名称、原始名称、类型、大小(MB)及处理参数
+
+    Returns:
+        str: 分片文件路径
+    """
+    (genome_name, genome_name_original, genome_type, genome_size_mb,
+     unmasked_dir, split_mask_dir, genome_split_size, max_length,
+     min_seq_length, shard_dir) = task
+
+    print(f"处理基因组: {genome_name} (大小: {genome_size_mb:.2f} MB)")
+
+    # 使用16 MB缓冲区写入临时分片文件
+    with tempfile.NamedTemporaryFile('wb', buffering=16 * 1024 * 1024, dir=shard_dir,
+                                     prefix=f'{genome_name}_', suffix='.tmp', delete=False) as outfile:
+        if genome_type == 'both':
+            # 处理有masked和unmasked两种类型的基因组
+            process_both_types(genome_name, genome_name_original, unmasked_dir, split_mask_dir,
+                              genome_size_mb, genome_split_size,
+                              max_length, outfile, min_seq_length)
+        else:
+            # 只处理unmasked基因组
+            process_unmasked_only(genome_name, genome_name_original, unmasked_dir,
+                                genome_size_mb, genome_split_size,
+                                max_length, outfile, min_seq_length)
+
+    return outfile.name
 
 
 def process_both_types(genome_name, genome_name_original, unmasked_dir, split_mask_dir,
@@ -93,7 +334,7 @@ def process_both_types(genome_name, genome_name_original, unmasked_dir, split_ma
         genome_size_mb (float): 基因组大小(MB)
         genome_split_size (int): 拆分阈值(MB)
         max_length (int): 最大序列长度
-        outfile: 输出文件句柄
+        outfile: 输出文件句柄（二进制模式）
     """
     if genome_size_mb < genome_split_size:
         # 小基因组，使用全部unmasked序列
@@ -126,7 +367,7 @@ def process_unmasked_only(genome_name, genome_name_original, unmasked_dir, genom
         genome_size_mb (float): 基因组大小(MB)
         genome_split_size (int): 拆分阈值(MB)
         max_length (int): 最大序列长度
-        outfile: 输出文件句柄
+        outfile: 输出文件句柄（二进制模式）
     """
     if genome_size_mb < genome_split_size:
         # 小基因组，使用全部序列
@@ -139,6 +380,40 @@ def process_unmasked_only(genome_name, genome_name_original, unmasked_dir, genom
                               outfile, genome_split_size, min_seq_length)
 
 
+@functools.lru_cache(maxsize=None)
+def scan_dir(directory):
+    """
+    列出目录一次并缓存，返回小写文件名到文件路径的映射
+
+    Args:
+        directory (str): 目录路径
+
+    Returns:
+        dict: 小写文件名 -> 文件路径，目录不存在时为空
+    """
+    if not os.path.isdir(directory):
+        return {}
+    return {entry.lower(): os.path.join(directory, entry) for entry in os.listdir(directory)}
+
+
+@functools.lru_cache(maxsize=None)
+def index_split_mask_dir(split_mask_dir):
+    """
+    为分割的masked文件建立索引（每个目录只建立一次）
+
+    Args:
+        split_mask_dir (str): 分割文件目录
+
+    Returns:
+        tuple: (小写的'_sp.txt'之前的文件名 -> 文件路径, 排序后的文件名列表)
+    """
+    index = {}
+    for entry, path in sorted(scan_dir(split_mask_dir).items()):
+        if entry.endswith('_sp.txt'):
+            index.setdefault(entry.split('_sp.txt')[0], path)
+    return index, list(index)
+
+
 def find_split_mask_file(split_mask_dir, genome_name):
     """
     查找分割的masked文件
@@ -150,19 +425,19 @@ def find_split_mask_file(split_mask_dir, genome_name):
     Returns:
         str: 文件路径，如果未找到返回None
     """
-    # 尝试多种大小写变体
-    name_variants = [
-        genome_name,              # 原始名称
-        genome_name.lower(),      # 小写版本
-        genome_name.title(),      # 首字母大写
-        genome_name.upper()       # 全大写
-    ]
-
-    for name in name_variants:
-        pattern = f"{name}*_sp.txt"
-        matches = glob(os.path.join(split_mask_dir, pattern))
-        if matches:
-            return matches[0]
+    # 在缓存的索引中按小写名称匹配，不区分大小写
+    index, stems = index_split_mask_dir(split_mask_dir)
+    target = genome_name.lower()
+
+    # 先直接查找同名文件，找不到时再查找以基因组名称开头的文件（例如'ath.hardmasked_sp.txt'）
+    path = index.get(target)
+    if path is not None:
+        return path
+
+    # 以前缀开头的文件名在排序后的列表中是连续的，二分查找第一个不小于前缀的位置即可
+    i = bisect.bisect_left(stems, target)
+    if i < len(stems) and stems[i].startswith(target):
+        return index[stems[i]]
     return None
 
 
@@ -177,22 +452,23 @@ def find_genome_file(directory, genome_name):
     Returns:
         str: 文件路径，如果未找到返回None
     """
-    # 尝试多种大小写变体
-    name_variants = [
-        genome_name,              # 原始名称
-        genome_name.lower(),      # 小写版本
-        genome_name.title(),      # 首字母大写
-        genome_name.upper()       # 全大写
-    ]
-
     file_patterns = ["*.fa", "*.fasta", "*.fa.gz", "*.fasta.gz"]
 
-    for name in name_variants:
-        for pattern in file_patterns:
-            full_pattern = f"{name}{pattern}"
-            matches = glob(os.path.join(directory, full_pattern))
-            if matches:
-                return matches[0]
+    # 在缓存的目录列表中按小写名称匹配，不区分大小写
+    entries = scan_dir(directory)
+    target = genome_name.lower()
+
+    # 先直接查找同名文件，找不到时再按前缀模式匹配
+    for pattern in file_patterns:
+        path = entries.get(f"{target}{pattern[1:]}")
+        if path is not None:
+            return path
+
+    for pattern in file_patterns:
+        full_pattern = f"{target}{pattern}"
+        for entry, path in entries.items():
+            if fnmatch.fnmatchcase(entry, full_pattern):
+                return path
     return None
 
 
@@ -206,7 +482,7 @@ def process_unmasked_genome(genome_name, genome_name_original, unmasked_dir, max
         genome_name_original (str): 原始基因组名称
         unmasked_dir (str): unmasked文件目录
         max_length (int): 最大序列长度
-        outfile: 输出文件句柄
+        outfile: 输出文件句柄（二进制模式）
         max_mb (float): 最大处理大小(MB)，None表示无限制
         min_seq_length (int): 过滤后的最小序列长度，默认为100
     """
@@ -216,28 +492,34 @@ def process_unmasked_genome(genome_name, genome_name_original, unmasked_dir, max
         return 0
 
     print(f"  处理文件: {os.path.basename(genome_file)}")
-    fa = pyfastx.Fasta(genome_file, build_index=True)
+    # 只需顺序遍历一次，使用无需建立索引的流式解析器
+    fa = pyfastx.Fastx(genome_file)
 
     total_chars = 0
     max_chars = max_mb * 1024 * 1024 if max_mb else float('inf')
 
-    for seq in fa:
-        sequence = str(seq.seq).upper()
-
-        # 拆分序列
-        for i in range(0, len(sequence), max_length):
-            sub_seq = sequence[i:i + max_length]
-
-            # 使用process_sequence处理序列：替换N并检查长度
-            processed_seq = process_sequence(sub_seq, min_seq_length)
-
-            if processed_seq is not None:  # 序列符合要求
-                print(processed_seq, file=outfile)
-                total_chars += len(processed_seq)
-
-            # 检查是否达到大小限制
-            if total_chars >= max_chars:
-                return total_chars / (1024 * 1024)  # 返回处理的MB数
+    for name, seq in fa:
+        sequence = seq.encode('ascii').translate(UPPER_TABLE)
+
+        # 向量化拆分序列：替换N并检查长度
+        data, lengths = chunk_sequence(sequence, max_length, min_seq_length)
+        if len(lengths) == 0:
+            continue
+
+        # 检查是否达到大小限制，只保留到首次达到限制的片段为止
+        cum = np.cumsum(lengths)
+        if total_chars + int(cum[-1]) >= max_chars:
+            k = int(np.searchsorted(cum, max_chars - total_chars)) + 1
+            # 前k个片段及其之间的k-1个换行符
+            outfile.write(data[:int(cum[k - 1]) + k - 1])
+            outfile.write(b'\n')
+            total_chars += int(cum[k - 1])
+            return total_chars / (1024 * 1024)  # 返回处理的MB数
+
+        # 整条序列的片段已在预先分配的数组中连续排列，直接整块写入，不再复制
+        outfile.write(data)
+        outfile.write(b'\n')
+        total_chars += int(cum[-1])
 
     return total_chars / (1024 * 1024)
 
@@ -249,7 +531,7 @@ def process_masked_genome(masked_file, max_length, outfile, max_mb, min_seq_leng
     Args:
         masked_file (str): masked文件路径
         max_length (int): 最大序列长度
-        outfile: 输出文件句柄
+        outfile: 输出文件句柄（二进制模式）
         max_mb (float): 最大处理大小(MB)
         min_seq_length (int): 过滤后的最小序列长度
 
@@ -259,23 +541,32 @@ def process_masked_genome(masked_file, max_length, outfile, max_mb, min_seq_leng
     total_chars = 0
     max_chars = max_mb * 1024 * 1024
 
-    with open(masked_file, 'r') as f:
-        for line in f:
-            sequence = line.strip().upper()
+    # 累积子序列，每WRITE_BATCH条拼接后写入一次
+    buf = []
 
-            # 拆分序列
-            for i in range(0, len(sequence), max_length):
-                sub_seq = sequence[i:i + max_length]
+    # 内存映射读取文件的每一行
+    for raw in read_lines_mmap(masked_file):
+        # 短于最小长度的行不可能产生符合要求的片段，跳过大写转换和拆分
+        if len(raw) < min_seq_length:
+            continue
+        sequence = raw.translate(UPPER_TABLE)
 
-                # 使用process_sequence处理序列：替换N并检查长度
-                processed_seq = process_sequence(sub_seq, min_seq_length)
+        # 拆分序列
+        for i in range(0, len(sequence), max_length):
+            sub_seq = sequence[i:i + max_length]
 
-                if processed_seq is not None:  # 序列符合要求
-                    print(processed_seq, file=outfile)
-                    total_chars += len(processed_seq)
+            # 使用process_sequence处理序列：替换N并检查长度
+            processed_seq = process_sequence(sub_seq, min_seq_length)
 
-            # 检查是否达到大小限制
-            if total_chars >= max_chars:
-                break
+            if processed_seq is not None:  # 序列符合要求
+                buf.append(processed_seq)
+                total_chars += len(processed_seq)
+                if len(buf) >= WRITE_BATCH:
+                    flush_sequences(buf, outfile)
 
-    return total_chars / (1024 * 1024)
\ No newline at end of file
+        # 检查是否达到大小限制
+        if total_chars >= max_chars:
+            break
+
+    flush_sequences(buf, outfile)
+    return total_chars / (1024 * 1024)
@@ -5,13 +5,108 @@
 """
 
 import os
+import bisect
+import functools
+import numpy as np
 import pandas as pd
-from Bio import SeqIO
 import pyfastx
 from glob import glob
 import re
-import fnmatch
-import gzip
+from concurrent.futures import ProcessPoolExecutor
+
+# 优先使用python-isal（ISA-L加速的gzip解压），未安装时退回标准库gzip
+try:
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+# numba为可选依赖，安装后使用JIT编译的逐字节计数循环
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# 基因组文件可接受的后缀（按同名文件时的优先顺序排列）
+GENOME_SUFFIXES = ('.fa', '.fasta', '.fa.gz', '.fasta.gz')
+
+# 文件名末尾的FASTA后缀（可带gzip压缩后缀），用于生成拆分后的输出文件名
+FASTA_SUFFIX_RE = re.compile(r'\.(?:fasta|fa)(?:\.gz|\.gzip)?$')
+
+
+@functools.lru_cache(maxsize=None)
+def _index_dir(directory):
+    """
+    扫描目录中的基因组文件并建立索引（每个目录只扫描一次）。
+
+    Args:
+        directory (str): 基因组文件所在的目录。
+
+    Returns:
+        dict: {小写的去后缀文件名: 完整路径}，按文件名排序；目录不存在时为空字典
+    """
+    if not os.path.isdir(directory):
+        return {}
+    entries = []
+    for entry in os.scandir(directory):
+        name = entry.name.lower()
+        for priority, suffix in enumerate(GENOME_SUFFIXES):
+            if name.endswith(suffix):
+                entries.append((name[:-len(suffix)], priority, entry.path))
+                break
+    index = {}
+    # 同名文件按后缀优先级保留第一个
+    for stem, _, path in sorted(entries):
+        index.setdefault(stem, path)
+    return index
+
+
+@functools.lru_cache(maxsize=None)
+def _sorted_stems(directory):
+    """返回_index_dir索引中排序后的文件名列表，用于前缀查找。"""
+    return list(_index_dir(directory))
+
+
+def find_genome_path(directory, genome_name):
+    """
+    在目录索引中查找基因组文件（不区分大小写）。
+
+    先按文件名精确查找，找不到时再查找以基因组名称开头的文件
+    （例如'ara.hardmasked.fa'）。
+
+    Args:
+        directory (str): 基因组文件所在的目录。
+        genome_name (str): 基因组名称。
+
+    Returns:
+        str: 基因组文件路径，未找到时返回None
+    """
+    index = _index_dir(directory)
+    prefix = genome_name.lower()
+    path = index.get(prefix)
+    if path is not None:
+        return path
+    # 以前缀开头的文件名在排序后的列表中是连续的，二分查找第一个不小于前缀的位置即可
+    stems = _sorted_stems(directory)
+    i = bisect.bisect_left(stems, prefix)
+    if i < len(stems) and stems[i].startswith(prefix):
+        return index[stems[i]]
+    return None
+
+
+def _resolve_genomes(genome_names, directory):
+    """
+    依次在目录索引中查找各基因组的文件。
+
+    Args:
+        genome_names (iterable): 小写的基因组名称。
+        directory (str): 基因组文件所在的目录。
+
+    Yields:
+        tuple: (基因组名称, 文件路径)，未找到时路径为None
+    """
+    for genome_name in genome_names:
+        yield genome_name, find_genome_path(directory, genome_name)
 
 
 def check_genome_files(genomes_info_path, masked_dir, unmasked_dir):
@@ -33,52 +128,20 @@ def check_genome_files(genomes_info_path, masked_dir, unmasked_dir):
     # 保留原始大小写，但同时创建小写版本用于匹配
     original_index = genome_df.index.copy()
     genome_df.index = genome_df.index.to_series().str.lower()
-
-    for i, genome_name_lower in enumerate(genome_df.index):
-        genome_name_original = original_index[i]
-        # 获取基因组类型
-        genome_type = genome_df.loc[genome_name_lower, 'genome_type']
-
-        # 定义基因组文件的匹配模式（考虑大小写变体）
-        def find_genome_file(directory):
-            """在目录中查找基因组文件，考虑不同的大小写变体"""
-            file_patterns = ["fa", 'fasta', 'fa.gz', 'fasta.gz']
-
-            # 尝试原始名称和不同的大小写变体
-            name_variants = [
-                genome_name_original,  # 原始名称
-                genome_name_lower,     # 小写版本
-                genome_name_lower.title(),  # 首字母大写
-                genome_name_lower.upper()   # 全大写
-            ]
-
-            for name in name_variants:
-                for pattern in file_patterns:
-                    if pattern.endswith('.gz'):
-                        base_pattern = pattern[:-3]  # 移除.gz
-                        path_pattern = f"{name}*.{base_pattern}.gz"
-                    else:
-                        path_pattern = f"{name}*.{pattern}"
-
-                    matches = glob(os.path.join(directory, path_pattern))
-                    if matches:
-                        return True
-            return False
-
-        if genome_type == 'both':
-            # 检查hardmasked基因组文件是否存在
-            if not find_genome_file(masked_dir):
-                print(f"{genome_name_original} hardmasked not existed")
-                FLAG = False
-            # 检查unmasked基因组文件是否存在
-            if not find_genome_file(unmasked_dir):
-                print(f"{genome_name_original} unmasked not existed")
-                FLAG = False
-        else:
-            # 检查unmasked基因组文件是否存在
-            if not find_genome_file(unmasked_dir):
-                print(f"{genome_name_original} unmasked not existed")
-                FLAG = False
+    # 循环前一次取出基因组类型列，避免逐行使用genome_df.loc查找
+    genome_types = genome_df['genome_type'].tolist()
+
+    resolved = _resolve_genomes(genome_df.index, unmasked_dir)
+    for genome_name_original, genome_type, (genome_name_lower, unmasked_path) in zip(
+            original_index, genome_types, resolved):
+        # 检查hardmasked基因组文件是否存在（只有'both'类型需要）
+        if genome_type == 'both' and find_genome_path(masked_dir, genome_name_lower) is None:
+            print(f"{genome_name_original} hardmasked not existed")
+            FLAG = False
+        # 检查unmasked基因组文件是否存在
+        if unmasked_path is None:
+            print(f"{genome_name_original} unmasked not existed")
+            FLAG = False
 
     return FLAG
 
@@ -87,36 +150,182 @@ def fasta_stats(fasta_file):
     """
     计算FASTA文件的统计信息。
 
+    已有pyfastx索引（.fxi文件）时直接从索引读取序列数目和长度；否则逐块扫描文件，
+    不在输入目录中新建索引文件。
+
+    Args:
+        fasta_file (str): FASTA文件的路径。
+
+    Returns:
+        dict: 包含统计信息的字典。
+    """
+    if not os.path.exists(fasta_file + '.fxi'):
+        return parse_fasta_stats(fasta_file)
+    try:
+        fa = pyfastx.Fasta(fasta_file, build_index=True)
+    except Exception:
+        # 索引文件损坏或与输入不匹配时退回到逐块扫描
+        return parse_fasta_stats(fasta_file)
+
+    total_bases = fa.size
+    num_sequences = len(fa)
+    average_length = int(round(total_bases / num_sequences, 0))
+
+    return {
+        'sum_len': total_bases,
+        'num_seqs': num_sequences,
+        'min_len': len(fa.shortest),
+        'max_len': len(fa.longest),
+        'avg_len': average_length
+    }
+
+
+def advise_sequential(f):
+    """提示内核将按顺序读取该文件，以增大预读窗口（仅在支持posix_fadvise的系统上生效）。"""
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+
+# count_fasta_block在数据块之间传递的状态（int64数组）中各字段的位置
+STATE_TOTAL, STATE_NUM, STATE_MIN, STATE_MAX, STATE_CUR, STATE_IN_RECORD, STATE_IN_HEADER = range(7)
+
+
+def count_fasta_block_kernel(data, state):
+    """
+    count_fasta_block的逐字节实现，只在安装了numba时使用（JIT编译）
+
+    Args:
+        data (np.ndarray): 数据块（uint8）
+        state (np.ndarray): 跨数据块的统计状态，原地更新
+    """
+    total = state[STATE_TOTAL]
+    num = state[STATE_NUM]
+    mn = state[STATE_MIN]
+    mx = state[STATE_MAX]
+    cur = state[STATE_CUR]
+    in_record = state[STATE_IN_RECORD]
+    in_header = state[STATE_IN_HEADER]
+    for i in range(data.shape[0]):
+        c = data[i]
+        if in_header:
+            # 跳过标题行
+            if c == 10:  # '\n'
+                in_header = 0
+        elif c == 62:  # '>'，遇到新记录，结算上一条记录的长度
+            if in_record:
+                total += cur
+                num += 1
+                mn = min(mn, cur)
+                mx = max(mx, cur)
+            in_record = 1
+            in_header = 1
+            cur = 0
+        elif in_record and c != 10 and c != 13:  # 跳过'\n'和'\r'
+            cur += 1
+    state[STATE_TOTAL] = total
+    state[STATE_NUM] = num
+    state[STATE_MIN] = mn
+    state[STATE_MAX] = mx
+    state[STATE_CUR] = cur
+    state[STATE_IN_RECORD] = in_record
+    state[STATE_IN_HEADER] = in_header
+
+
+if njit is not None:
+    count_fasta_block_kernel = njit(cache=True)(count_fasta_block_kernel)
+
+
+def count_fasta_block(block, state):
+    """
+    统计一个数据块中的序列长度，结果累加到state中。
+
+    安装了numba时使用JIT编译的逐字节循环，否则用bytes.find/bytes.count查找记录边界。
+
+    Args:
+        block (bytes): 数据块
+        state (np.ndarray): 跨数据块的统计状态，原地更新
+    """
+    if njit is not None:
+        count_fasta_block_kernel(np.frombuffer(block, dtype=np.uint8), state)
+        return
+
+    total, num, mn, mx, cur, in_record, in_header = (int(v) for v in state)
+
+    pos = 0
+    block_len = len(block)
+    while pos < block_len:
+        if in_header:
+            # 跳过标题行剩余部分
+            nl = block.find(b'\n', pos)
+            if nl == -1:
+                break
+            in_header = 0
+            pos = nl + 1
+            continue
+
+        # 查找下一条记录的开始位置，之前的部分都属于当前记录的序列行
+        gt = block.find(b'>', pos)
+        end = block_len if gt == -1 else gt
+        if in_record:
+            cur += (end - pos) - block.count(b'\n', pos, end) - block.count(b'\r', pos, end)
+
+        if gt == -1:
+            break
+
+        # 遇到新记录，结算上一条记录的长度
+        if in_record:
+            total += cur
+            num += 1
+            mn = min(mn, cur)
+            mx = max(mx, cur)
+        in_record = 1
+        in_header = 1
+        cur = 0
+        pos = gt + 1
+
+    state[:] = (total, num, mn, mx, cur, in_record, in_header)
+
+
+def parse_fasta_stats(fasta_file):
+    """
+    逐块读取FASTA文件并计算统计信息（不需要pyfastx索引）。
+
+    以二进制方式按8 MiB数据块读取，由count_fasta_block统计各条序列的长度，
+    不构造序列字符串。
+
     Args:
         fasta_file (str): FASTA文件的路径。
 
     Returns:
         dict: 包含统计信息的字典。
     """
-    total_bases = 0
-    num_sequences = 0
-    min_length = float('inf')
-    max_length = 0
-    lengths = []
-
-    # 使用Biopython的SeqIO模块解析FASTA文件
-    if fasta_file.endswith('.gz') or fasta_file.endswith('.gzip'):
-        with gzip.open(fasta_file, "rt") as handle:
-            for record in SeqIO.parse(handle, 'fasta'):
-                seq_length = len(record.seq)
-                total_bases += seq_length
-                num_sequences += 1
-                min_length = min(min_length, seq_length)
-                max_length = max(max_length, seq_length)
-                lengths.append(seq_length)
-    else:
-        for record in SeqIO.parse(fasta_file, 'fasta'):
-            seq_length = len(record.seq)
-            total_bases += seq_length
-            num_sequences += 1
-            min_length = min(min_length, seq_length)
-            max_length = max(max_length, seq_length)
-            lengths.append(seq_length)
+    # 当前序列长度、是否已进入第一条记录、是否位于标题行中等状态跨数据块保持
+    state = np.zeros(7, dtype=np.int64)
+    state[STATE_MIN] = np.iinfo(np.int64).max
+
+    with open(fasta_file, 'rb', buffering=0) as raw:
+        advise_sequential(raw)
+        if fasta_file.endswith('.gz') or fasta_file.endswith('.gzip'):
+            handle = gzip.open(raw, 'rb')
+        else:
+            handle = raw
+
+        with handle:
+            while True:
+                block = handle.read(1 << 23)
+                if not block:
+                    break
+                count_fasta_block(block, state)
+
+    total_bases, num_sequences, min_length, max_length, current_seq_len, in_record, _ = (
+        int(v) for v in state)
+
+    # 结算最后一条记录
+    if in_record:
+        total_bases += current_seq_len
+        num_sequences += 1
+        min_length = min(min_length, current_seq_len)
+        max_length = max(max_length, current_seq_len)
 
     average_length = int(round(total_bases / num_sequences, 0))
 
@@ -129,24 +338,26 @@ def fasta_stats(fasta_file):
     }
 
 
-def write_genome_sizes(genomes_info_path, unmasked_dir, output_dir):
+def write_genome_sizes(genomes_info_path, unmasked_dir, output_dir, num_workers=None):
     """
     计算并写入基因组大小的统计信息。
 
+    各基因组文件相互独立，使用多进程并行计算统计信息，再按原顺序写入输出文件。
+
     参数:
         genomes_info_path (str): 包含基因组信息的TSV文件路径。
         unmasked_dir (str): unmasked基因组文件所在的目录。
         output_dir (str): 输出文件的路径。
+        num_workers (int): 并行处理的进程数，默认为CPU核数
     """
     output_file = os.path.join(output_dir, 'genome_sizes.txt')
 
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
 
-    # 打开输出文件并准备写入表头
-    with open(output_file, 'w') as outfile:
-        print('file', 'format', 'type', 'num_seqs', 'sum_len', 'min_len',
-              'avg_len', 'max_len', sep='\t', file=outfile)
+    # 打开输出文件（1 MiB写缓冲）并准备写入表头
+    with open(output_file, 'w', buffering=1 << 20) as outfile:
+        outfile.write('file\tformat\ttype\tnum_seqs\tsum_len\tmin_len\tavg_len\tmax_len\n')
 
         # 读取包含基因组信息的TSV文件
         try:
@@ -158,79 +369,80 @@ def write_genome_sizes(genomes_info_path, unmasked_dir, output_dir):
             print(f"错误: 无法读取基因组信息文件 {genomes_info_path}: {e}")
             return
 
-        file_patterns = ["fa", 'fasta', 'fa.gz', 'fasta.gz']
-
-        # 遍历所有基因组名称
-        for i, genome_name in enumerate(genome_df.index):
-            genome_name_original = original_index[i]
-            fasta_file = None  # 初始化变量
-
-            # 尝试多种大小写变体查找基因组文件
-            name_variants = [
-                genome_name_original,  # 原始名称
-                genome_name,           # 小写版本
-                genome_name.title(),   # 首字母大写
-                genome_name.upper()    # 全大写
-            ]
-
-            # 遍历所有可能的文件后缀模式
-            for pattern in file_patterns:
-                if pattern.endswith('.gz'):
-                    base_pattern = pattern[:-3]  # 移除.gz
-                    path_pattern = f"*.{base_pattern}.gz"
-                else:
-                    path_pattern = f"*.{pattern}"
-
-                # 尝试每个名称变体
-                for name in name_variants:
-                    full_pattern = f"{name}{path_pattern}"
-                    matches = glob(os.path.join(unmasked_dir, full_pattern))
-                    if matches:
-                        # 获取符合条件的第一个文件路径
-                        fasta_file = matches[0]
-                        print(f"找到基因组文件: {os.path.basename(fasta_file)}")
-                        break
-
-                if fasta_file is not None:
-                    break  # 找到文件，跳出循环
-
+        # 先查找所有基因组文件，得到(基因组名称, 文件路径)列表
+        tasks = []
+        # 与check_genome_files共用同一份目录索引
+        resolved = _resolve_genomes(genome_df.index, unmasked_dir)
+        for genome_name_original, (genome_name, fasta_file) in zip(original_index, resolved):
             # 检查是否找到了文件
             if fasta_file is None:
                 print(f"警告: 未找到 {genome_name_original} 的基因组文件，跳过处理")
                 continue
+            print(f"找到基因组文件: {os.path.basename(fasta_file)}")
 
             # 验证文件是否可读
             if not os.access(fasta_file, os.R_OK):
                 print(f"警告: 无法读取文件 {fasta_file}，跳过处理")
                 continue
 
-            try:
-                # 计算该FASTA文件的统计信息
-                result = fasta_stats(fasta_file)
+            tasks.append((genome_name, fasta_file))
+
+        # 并行计算各FASTA文件的统计信息
+        with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+            futures = [executor.submit(fasta_stats, fasta_file) for _, fasta_file in tasks]
+
+            # 按原顺序将统计信息写入输出文件
+            for (genome_name, fasta_file), future in zip(tasks, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"错误: 处理文件 {fasta_file} 时出错: {e}")
+                    continue
 
-                # 将统计信息写入输出文件
-                print(genome_name, 'FASTA', 'DNA', result['num_seqs'],
-                      result['sum_len'], result['min_len'], result['avg_len'],
-                      result['max_len'], sep='\t', file=outfile)
+                outfile.write(f"{genome_name}\tFASTA\tDNA\t{result['num_seqs']}\t"
+                              f"{result['sum_len']}\t{result['min_len']}\t"
+                              f"{result['avg_len']}\t{result['max_len']}\n")
 
                 print(f"成功处理 {genome_name}: {result['num_seqs']} 条序列, "
                       f"总长度 {result['sum_len']:,} bp")
 
-            except Exception as e:
-                print(f"错误: 处理文件 {fasta_file} 时出错: {e}")
-                continue
-
     print(f"基因组统计信息已保存到: {output_file}")
 
 
-def split_hardmask_genome(masked_dir, out_dir, genomes_info_path):
+def split_one_hardmask_genome(filename, out_dir):
+    """
+    拆分单个hardmasked基因组文件，按N区域分割序列，每个片段写为一行。
+
+    Args:
+        filename (str): hardmasked基因组文件路径
+        out_dir (str): 输出目录
+    """
+    # 生成输出文件名（只替换文件名末尾的FASTA后缀）
+    outfilename = os.path.join(out_dir, FASTA_SUFFIX_RE.sub('_sp.txt', os.path.basename(filename)))
+
+    # 打开输出文件（1 MiB写缓冲）
+    with open(outfilename, 'w', buffering=1 << 20) as outio:
+        # 只需顺序读取每条序列，使用pyfastx.Fastx流式解析，不建立.fxi索引
+        for _name, sequence in pyfastx.Fastx(filename, uppercase=True):
+            # 按单个字符'N'拆分（str.split比正则快），只保留非空片段
+            parts = [p for p in sequence.split('N') if p]
+            # 每条序列的所有片段拼接后一次写入
+            if parts:
+                outio.write('\n'.join(parts))
+                outio.write('\n')
+
+
+def split_hardmask_genome(masked_dir, out_dir, genomes_info_path, num_workers=None):
     """
     拆分hardmasked基因组文件，按N区域分割序列。
 
+    各基因组文件的输出相互独立，使用多进程并行拆分。
+
     Args:
         masked_dir (str): hardmasked基因组文件目录
         out_dir (str): 输出目录
         genomes_info_path (str): 包含基因组信息的txt文件路径
+        num_workers (int): 并行处理的进程数，默认为CPU核数
     """
     # 读取基因组信息文件，获取需要处理的物种列表
     genome_df = pd.read_csv(genomes_info_path, sep='\t', index_col=0)
@@ -248,10 +460,12 @@ def split_hardmask_genome(masked_dir, out_dir, genomes_info_path):
     out_dir = os.path.join(out_dir, 'hardmask_split')
     os.makedirs(out_dir, exist_ok=True)
 
-    # 对每个基因组信息文件中的物种进行处理
+    # 对每个基因组信息文件中的物种查找hardmasked基因组文件
+    genome_types = genome_df['genome_type'].tolist()
+    tasks = []
     for i, genome_name_lower in enumerate(genome_df.index):
         genome_name_original = original_index[i]
-        genome_type = genome_df.loc[genome_name_lower, 'genome_type']
+        genome_type = genome_types[i]
 
         # 只处理类型为'both'的基因组（因为有hardmasked版本）
         if genome_type != 'both':
@@ -288,25 +502,12 @@ def split_hardmask_genome(masked_dir, out_dir, genomes_info_path):
             print(f"警告: 未找到 {genome_name_original} 的hardmasked基因组文件，跳过处理")
             continue
 
-        filename = found_file
-        # 创建pyfastx Fasta对象
-        fa = pyfastx.Fasta(filename, build_index=True, uppercase=True)
-
-        # 生成输出文件名
-        outfilename = (os.path.join(out_dir, os.path.basename(filename))
-                      .replace('.fasta.gz', '_sp.txt')
-                      .replace('.fa.gz', '_sp.txt')
-                      .replace('.fasta', '_sp.txt')
-                      .replace('.fa', '_sp.txt'))
-
-        # 打开输出文件
-        with open(outfilename, 'w') as outio:
-            for seq in fa:
-                sequence = seq.seq
-                seqlist = re.split(r'[N]+', sequence)
-
-                for seq_in_list in seqlist:
-                    if seq_in_list:  # 只输出非空序列
-                        print(seq_in_list, file=outio)
+        tasks.append((genome_name_original, found_file))
 
-        print(f"已处理 {genome_name_original} 的hardmasked基因组文件")
\ No newline at end of file
+    # 并行拆分各基因组文件
+    with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count()) as executor:
+        futures = [executor.submit(split_one_hardmask_genome, filename, out_dir)
+                   for _, filename in tasks]
+        for (genome_name_original, _), future in zip(tasks, futures):
+            future.result()
+            print(f"已处理 {genome_name_original} 的hardmasked基因组文件")
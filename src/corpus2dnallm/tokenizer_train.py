@@ -4,37 +4,72 @@ BPE分词器训练模块
 这个模块提供了使用SentencePiece训练BPE分词器的功能。
 """
 
+import os
+import glob
+import functools
 import sentencepiece as spm
 import logging
 
+logger = logging.getLogger(__name__)
+
+# 输出目录中由其他步骤生成、不属于语料库的.txt文件
+NON_CORPUS_FILES = frozenset({'genome_sizes.txt'})
+
+
+def is_corpus_file(entry):
+    """判断目录中的文件是否为语料库文件（.txt，排除隐藏文件和基因组大小统计文件）。"""
+    return (entry.is_file() and entry.name.endswith('.txt')
+            and not entry.name.startswith('.') and entry.name not in NON_CORPUS_FILES)
+
+
+def expand_input_files(input_file):
+    """
+    将训练数据路径展开为SentencePiece可接受的输入文件列表。
+
+    支持单个文件、逗号分隔的多个文件、目录以及通配符模式，语料库已按分片保存时
+    可直接传入分片所在目录。目录只使用其中的语料库文件（见is_corpus_file），
+    跳过genome_sizes.txt、模型文件和临时分片等其他文件。
+
+    Args:
+        input_file (str): 训练数据文件路径、目录或通配符模式
+
+    Returns:
+        str: 逗号分隔的输入文件路径
+    """
+    files = []
+    for path in input_file.split(','):
+        if os.path.isdir(path):
+            files.extend(sorted(entry.path for entry in os.scandir(path) if is_corpus_file(entry)))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path)))
+        else:
+            files.append(path)
+    return ','.join(files)
+
 
 def train_sentencepiece_model(input_file, model_prefix, vocab_size=8192,
-                             model_type='bpe', num_threads=4):
+                             model_type='bpe', num_threads=None):
     """
     训练SentencePiece模型的函数。
 
     Args:
-        input_file (str): 训练数据文件路径
+        input_file (str): 训练数据文件路径，也可以是逗号分隔的多个文件、目录或通配符模式
         model_prefix (str): 输出模型文件的前缀
         vocab_size (int): 词汇表大小，默认8192
         model_type (str): 模型类型，默认'bpe'
-        num_threads (int): 训练线程数，默认4
+        num_threads (int): 训练线程数，默认为CPU核数
 
     Returns:
         bool: 训练是否成功
     """
     try:
-        # 配置日志
-        logging.basicConfig(level=logging.INFO)
-        logger = logging.getLogger(__name__)
-
         # 使用SentencePieceTrainer的train方法训练模型
         spm.SentencePieceTrainer.train(
-            input=input_file,             # 指定输入文件
+            input=expand_input_files(input_file),  # 指定输入文件（多个文件以逗号分隔）
             model_prefix=model_prefix,    # 指定输出模型文件的前缀
             vocab_size=vocab_size,        # 指定词汇表大小
             model_type=model_type,        # 指定模型类型
-            num_threads=num_threads,      # 指定训练时使用的线程数
+            num_threads=num_threads or os.cpu_count(),  # 指定训练时使用的线程数
             input_format="text",          # 指定输入文件格式为文本
             add_dummy_prefix=False,       # 指定是否添加空格前缀
             # 其他可选参数
@@ -73,6 +108,28 @@ def train_sentencepiece_model(input_file, model_prefix, vocab_size=8192,
         return False
 
 
+@functools.lru_cache(maxsize=8)
+def _load_sp(model_path, mtime):
+    sp = spm.SentencePieceProcessor()
+    sp.load(model_path)
+    return sp
+
+
+def load_model(model_path):
+    """
+    加载SentencePiece模型，同一模型文件只加载一次。
+
+    缓存以文件修改时间为键的一部分，重新训练覆盖模型文件后会重新加载。
+
+    Args:
+        model_path (str): 模型文件路径
+
+    Returns:
+        SentencePieceProcessor: 加载好的模型
+    """
+    return _load_sp(model_path, os.path.getmtime(model_path))
+
+
 def validate_model(model_path, test_sequences=None):
     """
     验证训练好的模型
@@ -86,8 +143,7 @@ def validate_model(model_path, test_sequences=None):
     """
     try:
         # 加载模型
-        sp = spm.SentencePieceProcessor()
-        sp.load(model_path)
+        sp = load_model(model_path)
 
         print(f"模型验证成功:")
         print(f"- 词汇表大小: {sp.get_piece_size()}")
@@ -128,8 +184,7 @@ def get_vocab_info(model_path):
         dict: 词汇表信息
     """
     try:
-        sp = spm.SentencePieceProcessor()
-        sp.load(model_path)
+        sp = load_model(model_path)
 
         vocab_info = {
             'vocab_size': sp.get_piece_size(),
@@ -140,11 +195,9 @@ def get_vocab_info(model_path):
         }
 
         # 获取前几个词汇表示例子
-        sample_vocab = []
-        for i in range(min(20, sp.get_piece_size())):
-            piece = sp.id_to_piece(i)
-            score = sp.get_score(i)
-            sample_vocab.append((i, piece, score))
+        # id_to_piece和get_score接受列表，一次调用取回全部示例
+        ids = list(range(min(20, sp.get_piece_size())))
+        sample_vocab = list(zip(ids, sp.id_to_piece(ids), sp.get_score(ids)))
 
         vocab_info['sample_vocab'] = sample_vocab
 